@@ -1,52 +1,196 @@
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, g, Response
 from src.exception import CustomException
 from src.logger import logging as lg
-import os, sys
+import os, sys, time, cProfile
+from datetime import datetime
 
-from src.pipeline.train_pipeline import TrainingPipeline
 from src.pipeline.predict_pipeline import PredictionPipeline
+from src.pipeline.model_registry import model_registry
+from src.pipeline.micro_batcher import MicroBatcher
+from src.utils.schema import SchemaValidationError, load_schema
+from src.pipeline.training_jobs import TrainingInProgressError, training_job_manager
+from src.pipeline.challengers import challenger_manager
+from src.pipeline.drift_monitor import drift_monitor
+from src.utils.metrics import metrics
 
 app = Flask(__name__)
 
+def warm_up_models():
+    # Load model and preprocessor once per worker so the first request does not pay the unpickle cost
+    try:
+        model_registry.warm_up()
+    except Exception as e:
+        lg.warning(f"Model warm-up skipped: {str(e)}")
+
+warm_up_models()
+
+micro_batcher = MicroBatcher(predict_fn=PredictionPipeline(None).predict_array)
+
+# Per-request cProfile, enabled with ENABLE_REQUEST_PROFILING=1 and requested via ?profile=1 or X-Profile: 1
+REQUEST_PROFILING_ENABLED = os.getenv("ENABLE_REQUEST_PROFILING", "0") == "1"
+PROFILE_OUTPUT_DIR = os.path.join("logs", "profiles")
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if REQUEST_PROFILING_ENABLED and (request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1"):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    if getattr(g, "profiler", None) is not None:
+        g.profiler.disable()
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        profile_path = os.path.join(PROFILE_OUTPUT_DIR, f"{endpoint}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.prof")
+        g.profiler.dump_stats(profile_path)
+        response.headers["X-Profile-Path"] = profile_path
+    if hasattr(g, "request_start"):
+        metrics.observe("wafer_http_request_duration_seconds", time.perf_counter() - g.request_start, endpoint=endpoint)
+    metrics.inc("wafer_http_requests_total", endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.route("/metrics")
+def metrics_route():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/health")
+def health():
+    # Liveness: the worker is up and answering requests
+    return jsonify({"status": "ok"})
+
+@app.route("/ready")
+def ready():
+    # Readiness: a model is loaded and requests can be scored
+    if not model_registry.is_ready():
+        try:
+            model_registry.warm_up()
+        except Exception as e:
+            return jsonify({"status": "not ready", "error": str(e)}), 503
+    return jsonify({"status": "ready"})
+
 @app.route("/")
 def home():
     return "Welcome to my application"
 
-@app.route("/train")
+@app.route("/train", methods=['GET', 'POST'])
 def train_route():
     try:
-        lg.info("Starting training pipeline")
-        train_pipeline = TrainingPipeline()
-        model_score = train_pipeline.run_pipeline()
-        lg.info(f"Training completed with model score: {model_score}")
-        return f"Training Completed. Model Score: {model_score}"
+        lg.info("Queueing training pipeline")
+        job = training_job_manager.submit()
+        return jsonify({
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": f"/train/jobs/{job.job_id}",
+            "progress_url": f"/train/jobs/{job.job_id}/progress"
+        }), 202
     except Exception as e:
         lg.error(f"Error in train_route: {str(e)}")
         raise CustomException(e, sys)
 
+@app.route("/train/jobs")
+def list_training_jobs():
+    return jsonify([job.to_dict() for job in training_job_manager.list()])
+
+@app.route("/train/jobs/<job_id>")
+def training_job_status(job_id):
+    job = training_job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown training job {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/train/jobs/<job_id>/progress")
+def training_job_progress(job_id):
+    job = training_job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown training job {job_id}"}), 404
+    return jsonify({"job_id": job.job_id, "status": job.status, "current_stage": job.current_stage, "stages": job.stages})
+
+@app.route("/models")
+def list_models():
+    # Shadow statistics are collected per worker process; the pid tells which worker answered
+    return jsonify(challenger_manager.describe())
+
+@app.route("/models/challengers/<name>/promote", methods=['POST'])
+def promote_challenger(name):
+    try:
+        result = challenger_manager.promote(name)
+        if result is None:
+            return jsonify({"error": f"Unknown challenger {name}"}), 404
+        return jsonify(result)
+    except TrainingInProgressError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        lg.error(f"Error in promote_challenger: {str(e)}")
+        raise CustomException(e, sys)
+
+@app.route("/drift")
+def drift():
+    # Per-worker input drift against the training distribution; ?top=0 lists every sensor
+    try:
+        top_n = int(request.args["top"]) if "top" in request.args else None
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    return jsonify(drift_monitor.summary(top_n=top_n))
+
+@app.route("/drift/reset", methods=['POST'])
+def reset_drift():
+    drift_monitor.reset()
+    return jsonify({"status": "reset"})
+
 @app.route('/predict', methods=['POST', 'GET'])
 def upload():
     try:
         if request.method == 'POST':
             lg.info("Starting prediction pipeline")
             prediction_pipeline = PredictionPipeline(request)
-            prediction_file_detail = prediction_pipeline.run_pipeline()
-            lg.info("Prediction completed. Downloading prediction file.")
-            return send_file(
-                prediction_file_detail.prediction_file_path,
-                download_name=prediction_file_detail.prediction_file_name,
-                as_attachment=True
-            )
+            prediction_file_path, workspace_dir = prediction_pipeline.run_pipeline()
+            lg.info("Prediction completed. Streaming prediction file.")
+            response = Response(prediction_pipeline.iter_file_blocks(prediction_file_path), mimetype="text/csv")
+            response.headers["Content-Disposition"] = f"attachment; filename={os.path.basename(prediction_file_path)}"
+            # Runs once the response has been sent or the client disconnected
+            response.call_on_close(lambda: PredictionPipeline.remove_workspace(workspace_dir))
+            return response
         else:
             return render_template('upload_file.html')
+    except SchemaValidationError as e:
+        # Same error body as /predict/json; the whole upload is validated before any row is scored
+        return jsonify({"error": str(e), "invalid_rows": e.report.to_dict(orient="records")}), 400
     except Exception as e:
         lg.error(f"Error in upload: {str(e)}")
         raise CustomException(e, sys)
 
+@app.route('/predict/json', methods=['POST'])
+def predict_json():
+    try:
+        if request.mimetype == 'application/octet-stream':
+            features = PredictionPipeline.parse_binary_features(
+                request.get_data(), request.headers.get('X-Dtype', 'float64')
+            )
+        else:
+            features = PredictionPipeline.parse_json_features(request.get_json(force=True))
+    except (ValueError, TypeError) as e:
+        lg.warning(f"Rejected /predict/json payload: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    validation_report = load_schema().validate_array(features)
+    if not validation_report.empty:
+        lg.warning(f"Rejected /predict/json payload with {len(validation_report)} invalid rows")
+        return jsonify({"error": "Schema validation failed", "invalid_rows": validation_report.to_dict(orient="records")}), 400
+    try:
+        predictions = micro_batcher.predict(features)
+        target_column_mapping = {0: 'Bad', 1: 'Good'}
+        return jsonify({"predictions": [target_column_mapping.get(int(pred)) for pred in predictions]})
+    except Exception as e:
+        lg.error(f"Error in predict_json: {str(e)}")
+        raise CustomException(e, sys)
+
 if __name__ == "__main__":
     try:
         lg.info("Starting Flask app")
-        app.run(host="0.0.0.0", port=5000, debug=True)
+        # Development server only (production runs under gunicorn); the debugger allows code execution, so it is opt-in
+        app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG", "0") == "1")
     except Exception as e:
         lg.error(f"Error starting Flask app: {str(e)}")
         raise CustomException(e, sys)
\ No newline at end of file
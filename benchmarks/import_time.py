@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.run_benchmarks import prepare_workdir  # noqa: E402
+
+# Serving entry points should stay lean; the training path is expected to be heavy
+DEFAULT_MODULES = [
+    "src.logger",
+    "src.pipeline.predict_pipeline",
+    "app",
+    "src.pipeline.train_pipeline",
+    "src.components.model_trainer",
+]
+
+# Heavy dependencies whose presence after an import is reported
+HEAVY_MODULES = ["pandas", "sklearn", "scipy", "xgboost", "pymongo", "flask"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+PROBE = """
+import sys, time, warnings, resource
+warnings.filterwarnings("ignore")
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print("RESULT", elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ",".join(heavy))
+"""
+
+
+def import_once(module: str, workdir: str) -> dict:
+    # Fresh interpreter per measurement so nothing is cached in sys.modules
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    _, seconds, max_rss_kb, heavy = output.stdout.splitlines()[-1].split(" ")
+    # -X importtime lists children before their parent, one indentation level (two spaces) per depth;
+    # the direct children of the measured module show where its import time goes
+    children, pending = [], []
+    for line in output.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 1:
+            pending.append((match.group(4), int(match.group(2)) / 1e6))
+        elif depth == 0:
+            if match.group(4) == module:
+                children = pending
+            pending = []
+    return {
+        "seconds": float(seconds),
+        "max_rss_mb": round(int(max_rss_kb) / 1024, 1),
+        "heavy_modules": [name for name in heavy.split(",") if name],
+        "top_imports": sorted(children, key=lambda item: item[1], reverse=True)[:5],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import time of the serving and training entry points")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = []
+    # Same scratch layout as run_benchmarks (config and the committed model), so importing app
+    # includes the model warm-up and import side effects stay out of the checkout
+    workdir = prepare_workdir()
+    try:
+        for module in args.modules:
+            runs = [import_once(module, workdir) for _ in range(args.repeat)]
+            best = min(runs, key=lambda run: run["seconds"])
+            result = {"module": module, **best}
+            results.append(result)
+            top = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in best["top_imports"][:3])
+            print(f"{module:36s} {best['seconds']:7.3f}s  rss={best['max_rss_mb']:7.1f}MB  heavy=[{','.join(best['heavy_modules'])}]  top: {top}", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat, "results": results}, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import warnings
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.run_benchmarks import prepare_workdir  # noqa: E402
+from benchmarks.synthetic_wafers import generate_wafers  # noqa: E402
+
+DTYPES = ["float64", "float32"]
+
+
+def transform(data_path: str, dtype: str) -> tuple:
+    from src.components.data_transformation import DataTransformation
+    train_arr, test_arr, _ = DataTransformation(data_path, dtype=dtype).initiate_data_transformation()
+    return np.asarray(train_arr), np.asarray(test_arr)
+
+
+def fit_and_predict(model, train_arr: np.ndarray, test_arr: np.ndarray) -> dict:
+    start = time.perf_counter()
+    model.fit(train_arr[:, :-1], train_arr[:, -1])
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = model.predict(test_arr[:, :-1])
+    predict_seconds = time.perf_counter() - start
+    return {
+        "predictions": predictions,
+        "accuracy": float(np.mean(predictions == test_arr[:, -1])),
+        "fit_seconds": round(fit_seconds, 4),
+        "predict_seconds": round(predict_seconds, 4),
+    }
+
+
+def precision_report(data_path: str, model_names: list = None) -> dict:
+    from src.components.model_trainer import ModelTrainer
+
+    arrays = {dtype: transform(data_path, dtype) for dtype in DTYPES}
+    report = {
+        "matrices": {
+            dtype: {"train_shape": list(train.shape), "train_mb": round(train.nbytes / 2**20, 2), "test_mb": round(test.nbytes / 2**20, 2)}
+            for dtype, (train, test) in arrays.items()
+        },
+        "models": {},
+    }
+    for model_name, model in ModelTrainer.get_candidate_models().items():
+        if model_names and model_name not in model_names:
+            continue
+        if "random_state" in model.get_params():
+            model.set_params(random_state=42)
+        results = {dtype: fit_and_predict(model, *arrays[dtype]) for dtype in DTYPES}
+        agreement = float(np.mean(results["float64"]["predictions"] == results["float32"]["predictions"]))
+        report["models"][model_name] = {
+            **{f"{key}_{dtype}": results[dtype][key] for dtype in DTYPES for key in ("accuracy", "fit_seconds", "predict_seconds")},
+            "accuracy_delta": round(results["float32"]["accuracy"] - results["float64"]["accuracy"], 6),
+            "prediction_agreement": agreement,
+        }
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare accuracy, speed and memory of the float32 and float64 training paths")
+    parser.add_argument("--data", default=os.path.join(REPO_ROOT, "artifacts", "wafer_fault.csv"), help="labelled wafer CSV")
+    parser.add_argument("--rows", type=int, help="use this many synthetic wafers instead of --data")
+    parser.add_argument("--models", nargs="*", help="subset of candidate model names")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    data_path = os.path.abspath(args.data)
+    output_path = os.path.abspath(args.output) if args.output else None
+    warnings.filterwarnings("ignore")
+    workdir = prepare_workdir()
+    try:
+        os.chdir(workdir)
+        if args.rows:
+            data_path = os.path.abspath("synthetic_wafers.csv")
+            generate_wafers(args.rows).to_csv(data_path, index=False)
+        report = precision_report(data_path, args.models)
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for dtype, matrix in report["matrices"].items():
+        print(f"{dtype:8s} train {matrix['train_shape']}  {matrix['train_mb']:8.2f}MB train  {matrix['test_mb']:8.2f}MB test")
+    for model_name, result in report["models"].items():
+        print(
+            f"{model_name:28s} accuracy {result['accuracy_float64']:.4f} -> {result['accuracy_float32']:.4f} "
+            f"(delta {result['accuracy_delta']:+.4f}, agreement {result['prediction_agreement']:.4f})  "
+            f"fit {result['fit_seconds_float64']:.3f}s -> {result['fit_seconds_float32']:.3f}s"
+        )
+    if output_path:
+        with open(output_path, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Report written to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
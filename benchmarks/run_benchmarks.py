@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic_wafers import generate_wafers  # noqa: E402
+
+
+def measure(fn, repeat: int) -> dict:
+    # Best-of-N wall time, then one extra run under tracemalloc (which slows Python code) for the
+    # peak of traced allocations; numpy buffers are included in the trace
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(timings), "peak_mb": round(peak_bytes / 2**20, 2)}
+
+
+def prepare_workdir() -> str:
+    # Stages write to relative artifacts/ and predictions/ paths; keep them out of the repo checkout
+    workdir = tempfile.mkdtemp(prefix="wafer-bench-")
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+    shutil.copytree(os.path.join(REPO_ROOT, "templates"), os.path.join(workdir, "templates"))
+    os.makedirs(os.path.join(workdir, "artifacts"))
+    for name in ("model.pkl", "scaler.pkl"):
+        shutil.copy(os.path.join(REPO_ROOT, "artifacts", name), os.path.join(workdir, "artifacts", name))
+    return workdir
+
+
+def run_benchmarks(sizes: list, repeat: int, benchmarks: list) -> list:
+    from src.components.data_transformation import DataTransformation
+    from src.components.model_trainer import ModelTrainer
+    from src.pipeline.predict_pipeline import PredictionPipeline
+
+    results = []
+    for n_rows in sizes:
+        df = generate_wafers(n_rows)
+        train_csv = os.path.abspath(f"train_{n_rows}.csv")
+        upload_csv = os.path.abspath(f"upload_{n_rows}.csv")
+        df.to_csv(train_csv, index=False)
+        df.drop(columns=["Good/Bad"]).to_csv(upload_csv, index=False)
+
+        # Training cases write their preprocessor to their own folder; a narrower scaler (after feature
+        # selection) in artifacts/ would no longer match the model the prediction cases serve
+        training_dir = os.path.abspath(f"training_artifacts_{n_rows}")
+        cases = {}
+        cases["transformation"] = lambda: DataTransformation(train_csv, artifact_folder=training_dir).initiate_data_transformation()
+        cases["transformation_out_of_core"] = lambda: DataTransformation(train_csv, out_of_core=True, artifact_folder=training_dir).initiate_data_transformation()
+
+        def evaluate_models():
+            train_arr, _, _ = DataTransformation(train_csv, artifact_folder=training_dir).initiate_data_transformation()
+            trainer = ModelTrainer(output_dir=training_dir)
+            # Each repetition must fit, not hit the evaluation cache
+            shutil.rmtree(trainer.model_trainer_config.evaluation_cache_dir, ignore_errors=True)
+            trainer.evaluate_models(X=train_arr[:, :-1], y=train_arr[:, -1], models=trainer.models)
+        cases["evaluate_models"] = evaluate_models
+
+        cases["get_predicted_dataframe"] = lambda: PredictionPipeline(None).get_predicted_dataframe(upload_csv)
+
+        def predict_route():
+            from app import app
+            client = app.test_client()
+            with open(upload_csv, "rb") as upload_file:
+                response = client.post("/predict", data={"file": (upload_file, os.path.basename(upload_csv))}, content_type="multipart/form-data")
+            response.get_data()
+            # Closing the response removes the request workspace, as the WSGI server would
+            response.close()
+            assert response.status_code == 200, response.status_code
+        cases["predict_route"] = predict_route
+
+        for name, fn in cases.items():
+            if benchmarks and name not in benchmarks:
+                continue
+            result = {"benchmark": name, "rows": n_rows, **measure(fn, repeat)}
+            print(f"{name:32s} rows={n_rows:<8d} {result['seconds']:9.3f}s  peak={result['peak_mb']:9.2f}MB", flush=True)
+            results.append(result)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    baseline_results = {(r["benchmark"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result["benchmark"], result["rows"]))
+        if previous is None:
+            continue
+        ratio = result["seconds"] / previous["seconds"] if previous["seconds"] else float("inf")
+        result["baseline_seconds"] = previous["seconds"]
+        result["ratio"] = round(ratio, 3)
+        marker = "REGRESSION" if ratio > threshold else ""
+        print(f"{result['benchmark']:32s} rows={result['rows']:<8d} {previous['seconds']:9.3f}s -> {result['seconds']:9.3f}s  x{ratio:.2f} {marker}")
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time and memory-profile the wafer pipeline stages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--benchmarks", nargs="*", help="subset of benchmark names to run")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    warnings.filterwarnings("ignore")
+    os.chdir(prepare_workdir())
+    results = run_benchmarks(args.sizes, args.repeat, args.benchmarks)
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {output_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
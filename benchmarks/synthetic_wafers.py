@@ -0,0 +1,41 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+N_SENSORS = 590
+
+
+def generate_wafers(n_rows: int, nan_ratio: float = 0.04, constant_ratio: float = 0.2, fault_ratio: float = 0.06, seed: int = 42) -> pd.DataFrame:
+    # Roughly mirrors the real feature store: per-sensor scales spanning several orders of magnitude,
+    # a block of constant sensors, ~4% missing readings and ~6% faulty (+1) wafers
+    rng = np.random.default_rng(seed)
+    centers = rng.lognormal(mean=1.0, sigma=2.5, size=N_SENSORS) * rng.choice([-1, 1], size=N_SENSORS, p=[0.1, 0.9])
+    spreads = np.abs(centers) * rng.uniform(0.01, 0.3, size=N_SENSORS) + 1e-3
+    values = rng.normal(centers, spreads, size=(n_rows, N_SENSORS))
+
+    constant_columns = rng.random(N_SENSORS) < constant_ratio
+    values[:, constant_columns] = np.round(centers[constant_columns])
+
+    labels = np.where(rng.random(n_rows) < fault_ratio, 1, -1)
+    # Faulty wafers drift on a handful of sensors so the models have something to learn
+    drift_columns = rng.choice(np.flatnonzero(~constant_columns), size=20, replace=False)
+    values[np.ix_(labels == 1, drift_columns)] += 2 * spreads[drift_columns]
+
+    values[rng.random(values.shape) < nan_ratio] = np.nan
+    df = pd.DataFrame(values.round(4), columns=[f"Sensor-{i+1}" for i in range(N_SENSORS)])
+    df["Good/Bad"] = labels
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic wafer sensor CSV")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output_path")
+    parser.add_argument("--nan-ratio", type=float, default=0.04)
+    parser.add_argument("--without-target", action="store_true", help="drop Good/Bad, as in prediction uploads")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    df = generate_wafers(args.rows, nan_ratio=args.nan_ratio, seed=args.seed)
+    if args.without_target:
+        df = df.drop(columns=["Good/Bad"])
+    df.to_csv(args.output_path, index=False)
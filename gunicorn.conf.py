@@ -0,0 +1,76 @@
+import os
+import glob
+import time
+import signal
+import tempfile
+import threading
+import multiprocessing
+
+# Production serving: gunicorn --config gunicorn.conf.py app:app
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Import the app and load the model in the master so forked workers share those pages copy-on-write
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# Every worker keeps its own counters; they are written to this directory and /metrics in any worker
+# renders the total over all workers, the training runner and workers that have been recycled.
+# Set here, before the app is preloaded, so the master and every process started from it share it.
+os.environ.setdefault("METRICS_MULTIPROCESS_DIR", os.path.join(tempfile.gettempdir(), f"wafer-metrics-{bind.rsplit(':', 1)[-1]}"))
+
+# Training never runs in a worker: /train starts a separate runner process (src/pipeline/training_jobs.py)
+# and job state is kept in files, so the graceful reload below never interrupts a run or loses a job.
+# /drift and /models still describe the worker that answered, identified by the pid in the response.
+
+# Seconds between checks for new artifacts in the master; 0 disables the graceful reload
+artifact_watch_interval = float(os.getenv("ARTIFACT_WATCH_INTERVAL", "10"))
+
+
+def watch_artifacts(server):
+    from src.pipeline.model_registry import model_registry
+    while True:
+        time.sleep(artifact_watch_interval)
+        try:
+            changed = model_registry.changed_artifacts()
+            if not changed:
+                continue
+            server.log.info("Artifacts changed (%s); reloading workers", ", ".join(changed))
+            # Load the new artifacts in the master first so the replacement workers fork with them in place
+            model_registry.refresh()
+            os.kill(server.pid, signal.SIGHUP)
+        except Exception as e:
+            server.log.error("Artifact watcher failed: %s", e)
+
+
+def on_starting(server):
+    # Runs once per server start, unlike this file, which is re-read on every reload
+    for snapshot_path in glob.glob(os.path.join(os.environ["METRICS_MULTIPROCESS_DIR"], "*.json")):
+        os.remove(snapshot_path)
+
+
+def when_ready(server):
+    if artifact_watch_interval > 0:
+        threading.Thread(target=watch_artifacts, args=(server,), name="artifact-watcher", daemon=True).start()
+
+
+def post_fork(server, worker):
+    # The master's log listener thread does not survive the fork
+    from src.logger import start_worker_logging
+    start_worker_logging()
+
+
+def worker_exit(server, worker):
+    # Last snapshot of a recycled worker, so its counts stay in the totals
+    from src.utils.metrics import metrics
+    metrics.flush()
@@ -2,76 +2,220 @@ import sys
 import os
 import numpy as np
 import pandas as pd
+from datetime import datetime
+from bson import ObjectId
 from pymongo import MongoClient
 from src.constant import *
 from src.exception import CustomException
 from src.logger import logging
 from src.utils.main_utils import MainUtils
+from src.utils.artifact_store import ArtifactStore
+from src.utils.schema import load_schema
 from dataclasses import dataclass
 
 @dataclass
 class DataIngestionConfig:
     artifact_folder: str = os.path.join(artifact_folder)
+    feature_store_dir: str = os.path.join(artifact_folder, "feature_store")
+    feature_store_state_path: str = os.path.join(artifact_folder, "feature_store", "state.yaml")
+    batch_size: int = int(os.getenv("MONGO_BATCH_SIZE", "5000"))
+    # Field used as the high-water mark: the loader's updated_at (set on every upsert, so re-measured wafers are
+    # picked up) or "_id" (inserts only). updated_at is shared by every document of a load, so (updated_at, _id)
+    # is the actual mark. Documents written without the field sort first and are read on _id until the first
+    # document with the field; ones added after that are skipped with a warning. Run ingestion after a load has
+    # finished: documents committed out of order by a load in progress can be missed.
+    high_water_mark_field: str = os.getenv("MONGO_HIGH_WATER_MARK_FIELD", "updated_at")
+    # Identifies a wafer across documents; when a wafer is re-ingested after an update only its latest row is read
+    row_id_field: str = os.getenv("MONGO_ROW_ID_FIELD", "wafer_id")
 
 @dataclass
 class DataIngestion:
-    def __init__(self):
+    def __init__(self, mongo_client=None):
         self.data_ingestion_config = DataIngestionConfig()
         self.utils = MainUtils()
+        self.mongo_client = mongo_client
+        self.schema = load_schema()
+        self.artifact_store = ArtifactStore(dtype=self.schema.dtype)
+        self.expected_columns = self.schema.columns(include_target=True)
 
-    def export_collection_as_dataframe(self, collection_name, db_name):
+    def read_feature_store_state(self) -> dict:
+        if not os.path.exists(self.data_ingestion_config.feature_store_state_path):
+            return {"high_water_mark": None, "high_water_mark_type": None, "high_water_mark_id": None, "high_water_mark_id_type": None, "high_water_mark_field": None, "runs": 0, "partitions": []}
+        return self.utils.read_yaml_file(self.data_ingestion_config.feature_store_state_path)
+
+    @staticmethod
+    def encode_high_water_mark(value) -> tuple:
+        if isinstance(value, ObjectId):
+            return str(value), "objectid"
+        if isinstance(value, datetime):
+            return value.isoformat(), "datetime"
+        return value, None
+
+    @staticmethod
+    def decode_high_water_mark(value, value_type):
+        if value is None:
+            return None
+        if value_type == "objectid":
+            return ObjectId(value)
+        if value_type == "datetime":
+            return datetime.fromisoformat(value)
+        return value
+
+    def export_collection_in_batches(self, collection_name, db_name, high_water_mark=None, high_water_mark_id=None):
+        # Yields (frame, row ids, (mark value, _id)) per batch of documents above the high-water mark
         try:
             logging.info(f"Connecting to MongoDB: {db_name}.{collection_name}")
-            mongo_client = MongoClient(MONGO_DB_URL)
+            mongo_client = self.mongo_client or MongoClient(MONGO_DB_URL)
             collection = mongo_client[db_name][collection_name]
-            documents = list(collection.find())
-            
-            if not documents:
-                raise CustomException("No documents found in MongoDB collection", sys)
+            hwm_field = self.data_ingestion_config.high_water_mark_field
+            row_id_field = self.data_ingestion_config.row_id_field
+            batch_size = self.data_ingestion_config.batch_size
 
-            # Inspect sample document
-            logging.info(f"Sample document: {documents[0]}")
-            df = pd.DataFrame(documents)
-            logging.info(f"Raw DataFrame columns: {df.columns.tolist()}")
-            
-            if "_id" in df.columns:
-                df = df.drop(columns=['_id'], axis=1)
-            
-            # Define expected columns
-            expected_columns = [f"Sensor-{i+1}" for i in range(590)] + ["Good/Bad"]
-            if df.columns.tolist() != expected_columns:
-                logging.warning(f"Unexpected columns: {df.columns.tolist()}. Attempting to fix.")
-                if df.shape[1] != len(expected_columns):
-                    raise CustomException(f"Column count mismatch. Expected {len(expected_columns)}, got {df.shape[1]}. Sample document: {documents[0]}", sys)
-                df.columns = expected_columns
-
-            df.replace({"na": np.nan}, inplace=True)
-            logging.info(f"Processed DataFrame columns: {df.columns.tolist()}")
-            logging.info(f"First few rows:\n{df.head().to_string()}")
-
-            return df
+            without_field = {hwm_field: {"$exists": False}}
+            if high_water_mark is None and high_water_mark_id is None:
+                query = {}
+            elif high_water_mark is None:
+                # The last run stopped among documents written without the field, which sort before all others
+                query = {"$or": [{**without_field, "_id": {"$gt": high_water_mark_id}}, {hwm_field: {"$exists": True}}]}
+            elif hwm_field == "_id" or high_water_mark_id is None:
+                query = {hwm_field: {"$gt": high_water_mark}}
+            else:
+                # Documents sharing the mark value are ordered, and resumed, on _id
+                query = {"$or": [
+                    {hwm_field: {"$gt": high_water_mark}},
+                    {hwm_field: high_water_mark, "_id": {"$gt": high_water_mark_id}}
+                ]}
+                skipped = collection.count_documents({**without_field, "_id": {"$gt": high_water_mark_id}})
+                if skipped:
+                    logging.warning(f"Skipping {skipped} documents written without {hwm_field}; reload them with the wafer loader to ingest them")
+            sort_keys = [(hwm_field, 1)] if hwm_field == "_id" else [(hwm_field, 1), ("_id", 1)]
+            projection = {column: 1 for column in self.expected_columns}
+            projection[hwm_field] = 1
+            projection[row_id_field] = 1
+            logging.info(f"Streaming documents with {hwm_field} > {high_water_mark} ({high_water_mark_id}) in batches of {batch_size}")
+            cursor = collection.find(query, projection).sort(sort_keys).batch_size(batch_size)
+
+            documents = []
+            for document in cursor:
+                documents.append(document)
+                if len(documents) >= batch_size:
+                    yield self.documents_to_dataframe(documents), self.document_row_ids(documents), (documents[-1].get(hwm_field), documents[-1]["_id"])
+                    documents = []
+            if documents:
+                yield self.documents_to_dataframe(documents), self.document_row_ids(documents), (documents[-1].get(hwm_field), documents[-1]["_id"])
 
         except Exception as e:
-            logging.error(f"Error in export_collection_as_dataframe: {str(e)}")
+            logging.error(f"Error in export_collection_in_batches: {str(e)}")
             raise CustomException(e, sys)
 
+    def document_row_ids(self, documents: list) -> list:
+        # Documents loaded without a wafer id are identified by their _id and are never superseded
+        row_id_field = self.data_ingestion_config.row_id_field
+        return [str(document.get(row_id_field, document["_id"])) for document in documents]
+
+    def documents_to_dataframe(self, documents: list) -> pd.DataFrame:
+        missing_columns = [column for column in self.expected_columns if column not in documents[0]]
+        if missing_columns:
+            raise CustomException(f"Documents are missing {len(missing_columns)} expected columns, e.g. {missing_columns[:5]}", sys)
+        df = pd.DataFrame.from_records(documents, columns=self.expected_columns)
+        df.replace({"na": np.nan}, inplace=True)
+        df = df.apply(pd.to_numeric, errors="coerce").astype(self.schema.dtype_map(include_target=True))
+        logging.info("Fetched batch of %d documents", len(df))
+        return df
+
+    def published_partition_path(self, staged_partition: str) -> str:
+        return staged_partition.replace("_staging-", "part-")
+
+    def publish_partitions(self, staged_partitions: list) -> None:
+        # Renames staged partitions to their final names; partitions already renamed by an earlier attempt are skipped
+        for staged_partition in staged_partitions:
+            partition_path = self.published_partition_path(staged_partition)
+            for staged_sidecar, sidecar in zip(self.artifact_store.sidecar_paths(staged_partition), self.artifact_store.sidecar_paths(partition_path)):
+                if os.path.exists(staged_sidecar):
+                    os.replace(staged_sidecar, sidecar)
+            if os.path.exists(staged_partition):
+                os.replace(staged_partition, partition_path)
+
+    def recover_feature_store(self, state: dict) -> dict:
+        # Finishes the publish of a run that crashed after its state was written, and drops staged
+        # partitions of a run that crashed before; their documents are still above the high-water mark
+        feature_store_dir = self.data_ingestion_config.feature_store_dir
+        pending_partitions = [os.path.join(feature_store_dir, name) for name in state.get("pending_partitions", [])]
+        if pending_partitions:
+            logging.warning(f"Publishing {len(pending_partitions)} partitions left pending by an interrupted ingestion")
+            self.publish_partitions(pending_partitions)
+            state = {key: value for key, value in state.items() if key != "pending_partitions"}
+            self.utils.write_yaml_file(self.data_ingestion_config.feature_store_state_path, state)
+        for staged_partition in self.artifact_store.list_partitions(feature_store_dir, prefix="_staging-"):
+            logging.warning(f"Removing partition staged by an interrupted ingestion: {staged_partition}")
+            for path in [staged_partition] + self.artifact_store.sidecar_paths(staged_partition):
+                if os.path.exists(path):
+                    os.remove(path)
+        return state
+
     def export_data_into_feature_store_file_path(self) -> str:
         try:
-            logging.info("Exporting data from MongoDB")
-            raw_file_path = self.data_ingestion_config.artifact_folder
-            os.makedirs(raw_file_path, exist_ok=True)
-            
-            sensor_data = self.export_collection_as_dataframe(
+            logging.info("Exporting new data from MongoDB")
+            feature_store_dir = self.data_ingestion_config.feature_store_dir
+            os.makedirs(feature_store_dir, exist_ok=True)
+
+            state = self.recover_feature_store(self.read_feature_store_state())
+            high_water_mark = self.decode_high_water_mark(state["high_water_mark"], state["high_water_mark_type"])
+            high_water_mark_id = self.decode_high_water_mark(state.get("high_water_mark_id"), state.get("high_water_mark_id_type"))
+            hwm_field = self.data_ingestion_config.high_water_mark_field
+            # States written before the field was recorded could only hold an _id (ObjectId) or a timestamp mark
+            state_field = state.get("high_water_mark_field") or ("_id" if state["high_water_mark_type"] == "objectid" else hwm_field)
+            if (high_water_mark is not None or high_water_mark_id is not None) and state_field != hwm_field:
+                # A mark on another field cannot be compared with this one. Everything is read again; partitions
+                # keep only the latest row per wafer, so re-read documents replace their earlier rows.
+                logging.warning(f"High-water mark field changed from {state_field} to {hwm_field}; re-reading the collection")
+                high_water_mark, high_water_mark_id = None, None
+
+            # Each batch becomes its own staged partition. Once the whole delta has been fetched, the new
+            # high-water mark is written together with the staged partitions as pending, then they are renamed
+            # into place and the pending list is cleared. A crash at any point either leaves the mark unchanged
+            # (staged files are dropped and re-fetched) or is finished by the next run, so no delta is appended twice.
+            run_number = state.get("runs", 0) + 1
+            staged_partitions = []
+            for batch_number, (batch, row_ids, (high_water_mark, high_water_mark_id)) in enumerate(self.export_collection_in_batches(
                 collection_name=MONGO_COLLECTION_NAME,
-                db_name=MONGO_DATABASE_NAME
-            )
+                db_name=MONGO_DATABASE_NAME,
+                high_water_mark=high_water_mark,
+                high_water_mark_id=high_water_mark_id
+            )):
+                partition_base = os.path.join(feature_store_dir, f"_staging-{run_number:05d}-{batch_number:05d}")
+                staged_partition = self.artifact_store.write_frame(batch, partition_base)
+                self.artifact_store.write_row_ids(staged_partition, row_ids)
+                staged_partitions.append(staged_partition)
 
-            feature_store_file_path = os.path.join(raw_file_path, 'wafer_fault.csv')
-            logging.info(f"Saving data to {feature_store_file_path}")
-            sensor_data.to_csv(feature_store_file_path, index=False)
+            if staged_partitions:
+                new_partitions = [os.path.basename(self.published_partition_path(path)) for path in staged_partitions]
+                encoded_value, value_type = self.encode_high_water_mark(high_water_mark)
+                encoded_id, id_type = self.encode_high_water_mark(high_water_mark_id)
+                if hwm_field == "_id":
+                    encoded_id, id_type = None, None
+                state = {
+                    "high_water_mark": encoded_value,
+                    "high_water_mark_type": value_type,
+                    "high_water_mark_id": encoded_id,
+                    "high_water_mark_id_type": id_type,
+                    "high_water_mark_field": hwm_field,
+                    "runs": run_number,
+                    "partitions": state["partitions"] + new_partitions
+                }
+                state_path = self.data_ingestion_config.feature_store_state_path
+                self.utils.write_yaml_file(state_path, {**state, "pending_partitions": [os.path.basename(path) for path in staged_partitions]})
+                self.publish_partitions(staged_partitions)
+                self.utils.write_yaml_file(state_path, state)
+                logging.info(f"Appended {len(new_partitions)} new partitions to {feature_store_dir}")
+            else:
+                logging.info("No new documents since the last ingestion")
 
-            logging.info(f"Data saved to {feature_store_file_path}")
-            return feature_store_file_path
+            if not self.artifact_store.list_partitions(feature_store_dir):
+                raise CustomException("No documents found in MongoDB collection", sys)
+
+            logging.info(f"Feature store at {feature_store_dir}")
+            return feature_store_dir
         except Exception as e:
             logging.error(f"Error in export_data_into_feature_store_file_path: {str(e)}")
             raise CustomException(e, sys)
@@ -85,4 +229,4 @@ class DataIngestion:
             return feature_store_file_path
         except Exception as e:
             logging.error(f"Error in initiate_data_ingestion: {str(e)}")
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
@@ -3,70 +3,226 @@ import sys
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from src.exception import CustomException
-from src.logger import logging as lg
-import pickle
+from src.logger import logging as lg, lazy
+from src.utils.main_utils import MainUtils
+from src.utils.artifact_store import ArtifactStore
+from src.utils.schema import load_schema
+from src.utils.feature_selector import FeatureSelector
+from src.utils.drift_baseline import baseline_stride, fit_drift_baseline
 
 class DataTransformation:
-    def __init__(self, feature_store_file_path):
+    def __init__(self, feature_store_file_path, out_of_core=None, chunk_size=None, dtype=None, artifact_folder=None):
         self.feature_store_file_path = feature_store_file_path
-        self.artifact_folder = "artifacts"
-        self.target_column = "Good/Bad"
+        # Out-of-core mode streams the feature store in chunks instead of loading it at once
+        self.out_of_core = out_of_core if out_of_core is not None else os.getenv("TRANSFORMATION_OUT_OF_CORE", "0") == "1"
+        self.chunk_size = chunk_size or int(os.getenv("TRANSFORMATION_CHUNK_SIZE", "50000"))
+        # The training pipeline writes into a per-run staging folder and publishes the preprocessor only once training succeeds
+        self.artifact_folder = artifact_folder or "artifacts"
+        self.schema = load_schema()
+        self.target_column = self.schema.target_column
+        # float32 (schema dtype or FEATURE_DTYPE) halves the size of every matrix from the reader to the model
+        self.dtype = np.dtype(dtype or self.schema.dtype)
+        self.dtype_map = self.schema.dtype_map(self.dtype, include_target=True)
+        self.artifact_store = ArtifactStore(dtype=self.dtype)
+        self.train_path = self.artifact_store.path_for(os.path.join(self.artifact_folder, "train"))
+        self.test_path = self.artifact_store.path_for(os.path.join(self.artifact_folder, "test"))
+        self.preprocessor_path = os.path.join(self.artifact_folder, "scaler.pkl")
+        self.feature_selection_config = MainUtils().read_schema_config_file().get("feature_selection", {})
+
+    def build_feature_selector(self):
+        config = self.feature_selection_config
+        if not config.get("enabled", False):
+            return None
+        return FeatureSelector(
+            max_nan_ratio=config.get("max_nan_ratio", 0.7),
+            min_variance=config.get("min_variance", 0.0),
+            max_correlation=config.get("max_correlation", 0.98),
+            min_importance=config.get("min_importance")
+        )
+
+    @staticmethod
+    def stack_features_and_target(X: np.ndarray, y, dtype: np.dtype) -> np.ndarray:
+        # Single allocation in the target dtype; np.c_ would promote float32 features to float64
+        array = np.empty((X.shape[0], X.shape[1] + 1), dtype=dtype)
+        array[:, :-1] = X
+        array[:, -1] = y
+        return array
+
+    def iter_chunks(self):
+        for chunk in self.artifact_store.iter_frames(self.feature_store_file_path, self.chunk_size, dtype=self.dtype_map):
+            chunk = self.schema.align(chunk, include_target=True)
+            yield chunk.drop(columns=[self.target_column]), chunk[self.target_column].map({1: 1, -1: 0}).to_numpy()
+
+    def initiate_out_of_core_transformation(self):
+        try:
+            lg.info(f"Streaming data from {self.feature_store_file_path} in chunks of {self.chunk_size} rows")
+            if self.artifact_store.artifact_format != "npy":
+                raise CustomException("Out-of-core transformation writes memory-mapped arrays and needs the npy artifact format", sys)
+
+            # Pass 1: row count, labels and per-column sums for the imputation means and variances
+            feature_columns = self.schema.sensor_columns
+            column_sums = np.zeros(len(feature_columns))
+            column_squares = np.zeros(len(feature_columns))
+            column_counts = np.zeros(len(feature_columns))
+            labels = []
+            for X_chunk, y_chunk in self.iter_chunks():
+                values = X_chunk.to_numpy(dtype=np.float64)
+                column_sums += np.nansum(values, axis=0)
+                column_squares += np.nansum(values ** 2, axis=0)
+                column_counts += np.sum(~np.isnan(values), axis=0)
+                labels.append(y_chunk)
+            y = np.concatenate(labels)
+            n_rows = len(y)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                column_means = column_sums / column_counts
+                column_variances = column_squares / column_counts - column_means ** 2
+
+            selector = self.build_feature_selector()
+            selected_columns = feature_columns
+            if selector is not None:
+                keep = selector.filter_columns(1 - column_counts / n_rows, column_variances)
+                # Extra pass: cross-products of the centered, mean-imputed candidate columns for the correlation filter
+                cross_products = np.zeros((keep.sum(), keep.sum()))
+                for X_chunk, _ in self.iter_chunks():
+                    centered = X_chunk.to_numpy(dtype=np.float64)[:, keep] - column_means[keep]
+                    centered[np.isnan(centered)] = 0.0
+                    cross_products += centered.T @ centered
+                # The centered diagonal is the exact variance; E[x^2] - mean^2 can leave constant sensors slightly above zero
+                non_constant = np.diag(cross_products) / column_counts[keep] > selector.min_variance
+                keep[np.flatnonzero(keep)[~non_constant]] = False
+                keep = selector.drop_correlated(keep, cross_products[np.ix_(non_constant, non_constant)])
+                if selector.min_importance:
+                    lg.warning("Importance pruning needs the full matrix and is skipped in out-of-core mode")
+                selector.set_selection(keep, feature_columns)
+                selected_columns = list(selector.get_feature_names_out())
+                column_means = column_means[selector.selected_indices_]
+                lg.info(f"Feature selection kept {len(selected_columns)} of {len(feature_columns)} sensors")
+
+            # A one-row frame of the means fits the same imputer a full fit would produce
+            imputer = SimpleImputer(strategy="mean", keep_empty_features=True)
+            imputer.fit(pd.DataFrame([column_means], columns=selected_columns))
+            steps = [("imputer", imputer)]
+            if selector is not None:
+                steps.insert(0, ("selector", selector))
+
+            # Pass 2: incremental mean/variance of the imputed data, plus at most BASELINE_MAX_ROWS evenly spaced
+            # raw rows for the drift baseline
+            scaler = StandardScaler()
+            stride = baseline_stride(n_rows)
+            baseline_rows = []
+            start = 0
+            for X_chunk, _ in self.iter_chunks():
+                if selector is not None:
+                    X_chunk = selector.transform(X_chunk)
+                baseline_rows.append(X_chunk.iloc[-start % stride::stride].to_numpy(dtype=np.float64))
+                start += len(X_chunk)
+                scaler.partial_fit(imputer.transform(X_chunk))
+            preprocessor = Pipeline(steps + [("scaler", scaler)])
+            preprocessor.drift_baseline_ = fit_drift_baseline(np.concatenate(baseline_rows), scaler.mean_, scaler.scale_)
+
+            # Same permutation train_test_split would apply to the full matrix
+            train_index, test_index = train_test_split(np.arange(n_rows), test_size=0.2, random_state=42)
+            row_positions = np.full(n_rows, -1)
+            row_in_train = np.zeros(n_rows, dtype=bool)
+            row_positions[train_index] = np.arange(len(train_index))
+            row_positions[test_index] = np.arange(len(test_index))
+            row_in_train[train_index] = True
+
+            # Pass 3: scale chunk by chunk straight into preallocated memory-mapped outputs
+            columns = selected_columns + [self.target_column]
+            os.makedirs(self.artifact_folder, exist_ok=True)
+            outputs = {}
+            for path, n_split_rows in ((self.train_path, len(train_index)), (self.test_path, len(test_index))):
+                outputs[path] = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=self.dtype, shape=(n_split_rows, len(columns)))
+            start = 0
+            for X_chunk, y_chunk in self.iter_chunks():
+                stop = start + len(X_chunk)
+                X_scaled = preprocessor.transform(X_chunk)
+                for path, in_split in ((self.train_path, row_in_train[start:stop]), (self.test_path, ~row_in_train[start:stop])):
+                    positions = row_positions[start:stop][in_split]
+                    outputs[path][positions, :-1] = X_scaled[in_split]
+                    outputs[path][positions, -1] = y_chunk[in_split]
+                start = stop
+
+            output_shapes = {}
+            for path, output in outputs.items():
+                output.flush()
+                output_shapes[path] = output.shape
+            outputs.clear()
+            for path, shape in output_shapes.items():
+                self.artifact_store.write_schema(path, columns, self.dtype, shape)
+                os.replace(path + ".tmp", path)
+
+            MainUtils.save_object(file_path=self.preprocessor_path, obj=preprocessor)
+            train_arr = self.artifact_store.read_array(self.train_path)
+            test_arr = self.artifact_store.read_array(self.test_path)
+            lg.info(f"Out-of-core transformation completed. Train path: {self.train_path}, Test path: {self.test_path}, Scaler path: {self.preprocessor_path}")
+            return train_arr, test_arr, self.preprocessor_path
+
+        except Exception as e:
+            lg.error(f"Error in out-of-core data transformation: {str(e)}")
+            raise CustomException(e, sys)
 
     def initiate_data_transformation(self):
+        if self.out_of_core:
+            return self.initiate_out_of_core_transformation()
         try:
             lg.info(f"Loading data from {self.feature_store_file_path}")
             if not os.path.exists(self.feature_store_file_path):
                 raise FileNotFoundError(f"CSV file not found at {self.feature_store_file_path}")
-            
-            with open(self.feature_store_file_path, 'r') as file:
-                lg.info("First 5 lines of CSV:")
-                for i, line in enumerate(file):
-                    if i < 5:
-                        lg.info(line.strip())
-                    if i >= 5:
-                        break
-
-            df = pd.read_csv(self.feature_store_file_path, header=0)
-            lg.info("DataFrame columns: %s", df.columns.tolist())
-            
-            if df.columns[0] == '0' or isinstance(df.columns[0], int):
-                lg.warning("Numeric columns detected. Assigning expected columns.")
-                expected_columns = [f"Sensor-{i+1}" for i in range(df.shape[1]-1)] + [self.target_column]
-                if df.shape[1] != len(expected_columns):
-                    raise CustomException(f"Column count mismatch. Expected {len(expected_columns)}, got {df.shape[1]}", sys)
-                df.columns = expected_columns
-                lg.info("Assigned columns: %s", df.columns.tolist())
-
-            if self.target_column not in df.columns:
-                raise CustomException(f"Target column '{self.target_column}' not found in DataFrame. Available columns: {list(df.columns)}", sys)
-
-            lg.info("First few rows:\n%s", df.head().to_string())
-            numeric_columns = df.select_dtypes(include=[np.number]).columns
-            df[numeric_columns] = df[numeric_columns].fillna(df[numeric_columns].mean())
 
+            # The feature store is either a single file or a directory of partitions appended by ingestion
+            if os.path.isdir(self.feature_store_file_path):
+                df = self.artifact_store.read_partitions(self.feature_store_file_path, dtype=self.dtype_map)
+            else:
+                df = self.artifact_store.read_frame(self.feature_store_file_path, mmap=False, dtype=self.dtype_map)
+            lg.info("Loaded frame with shape %s", df.shape)
+            lg.debug("DataFrame columns: %s", lazy(df.columns.tolist))
+            df = self.schema.align(df, include_target=True)
+
+            if lg.getLogger().isEnabledFor(lg.DEBUG):
+                lg.debug("First few rows:\n%s", lazy(df.head().to_string))
             X = df.drop(columns=[self.target_column])
             y = df[self.target_column].map({1: 1, -1: 0})
 
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
+            # Feature selection and mean imputation are part of the fitted preprocessor so serving applies exactly the same steps
+            steps = [
+                ("imputer", SimpleImputer(strategy="mean", keep_empty_features=True)),
+                ("scaler", StandardScaler())
+            ]
+            selector = self.build_feature_selector()
+            if selector is not None:
+                steps.insert(0, ("selector", selector))
+            preprocessor = Pipeline(steps)
+            X_scaled = preprocessor.fit_transform(X, y)
+            selected_columns = X.columns.tolist()
+            if selector is not None:
+                selected_columns = list(selector.get_feature_names_out())
+                lg.info(f"Feature selection kept {len(selected_columns)} of {X.shape[1]} sensors")
+            # Training histogram of every scaled sensor, saved with the preprocessor for the drift monitor
+            baseline_X = X.iloc[::baseline_stride(len(X))].to_numpy(dtype=np.float64)
+            if selector is not None:
+                baseline_X = baseline_X[:, selector.selected_indices_]
+            scaler = preprocessor.named_steps["scaler"]
+            preprocessor.drift_baseline_ = fit_drift_baseline(baseline_X, scaler.mean_, scaler.scale_)
 
             X_train, X_test, y_train, y_test = train_test_split(
                 X_scaled, y, test_size=0.2, random_state=42
             )
 
-            train_arr = np.c_[X_train, y_train]
-            test_arr = np.c_[X_test, y_test]
+            train_arr = self.stack_features_and_target(X_train, y_train, self.dtype)
+            test_arr = self.stack_features_and_target(X_test, y_test, self.dtype)
 
-            train_path = os.path.join(self.artifact_folder, "train.csv")
-            test_path = os.path.join(self.artifact_folder, "test.csv")
-            pd.DataFrame(train_arr, columns=X.columns.tolist() + [self.target_column]).to_csv(train_path, index=False)
-            pd.DataFrame(test_arr, columns=X.columns.tolist() + [self.target_column]).to_csv(test_path, index=False)
+            columns = selected_columns + [self.target_column]
+            train_path = self.artifact_store.write_array(train_arr, columns, self.train_path)
+            test_path = self.artifact_store.write_array(test_arr, columns, self.test_path)
 
-            scaler_path = os.path.join(self.artifact_folder, "scaler.pkl")
-            with open(scaler_path, "wb") as file:
-                pickle.dump(scaler, file)
+            scaler_path = self.preprocessor_path
+            MainUtils.save_object(file_path=scaler_path, obj=preprocessor)
 
             lg.info(f"Data transformation completed. Train path: {train_path}, Test path: {test_path}, Scaler path: {scaler_path}")
             return train_arr, test_arr, scaler_path
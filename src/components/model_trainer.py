@@ -1,56 +1,264 @@
 import sys
 from typing import Generator, List, Tuple
 import os
+import time
+import shutil
+import glob
+import hashlib
+import tempfile
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_limits
 from sklearn.metrics import accuracy_score
-from xgboost import XGBClassifier
-from sklearn.svm import SVC
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import (
+    ParameterGrid, ParameterSampler, StratifiedKFold, cross_val_score, train_test_split
+)
 from src.constant import *
 from src.exception import CustomException
 from src.logger import logging
 from src.utils.main_utils import MainUtils
+from src.utils.inference_model import InferenceModel
+from src.utils.fold_ensemble import FoldEnsemble, positive_scores
+from src.utils.metrics import metrics
 from dataclasses import dataclass
 
 @dataclass
 class ModelTrainerConfig:
     artifact_folder = os.path.join(artifact_folder)
     trained_model_path = os.path.join(artifact_folder, "model.pkl")
+    inference_model_path = os.path.join(artifact_folder, "inference_model.pkl")
     expected_accuracy = 0.45
     model_config_file_path = os.path.join('config', 'model.yaml')
+    evaluation_cache_dir = os.path.join(artifact_folder, "evaluation_cache")
+    # "champion" replaces the served model; "challenger" publishes the new model for shadow scoring next to it
+    publish_mode = os.getenv("MODEL_PUBLISH_MODE", "champion")
+    challengers_dir = challenger_folder
+
+
+def fit_and_score_fold(model_name: str, model: object, n_threads: int, fold_data_dir: str, fold: int, fold_bounds: list) -> dict:
+    # Runs in a worker process on the memory-mapped fold data; only the estimator and scores cross the process
+    # boundary. Rows are stored grouped by fold and followed by a second copy of the leading folds (see
+    # write_fold_data), so both the validation rows and the fit rows (every other fold) are zero-copy slices of the map.
+    X = np.load(os.path.join(fold_data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(fold_data_dir, "y.npy"), mmap_mode="r")
+    start, stop = fold_bounds[fold], fold_bounds[fold + 1]
+    n_rows = fold_bounds[-1]
+    X_fit = X[stop:start + n_rows]
+    y_fit = y[stop:start + n_rows]
+    # Caps native thread pools so parallel fits don't oversubscribe cores
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_threads)
+    with threadpool_limits(limits=n_threads):
+        model.fit(X_fit, y_fit)
+        y_pred = model.predict(X[start:stop])
+        oof_scores = positive_scores(model, X[start:stop])
+    return {
+        "model_name": model_name,
+        "fold": fold,
+        "model": model,
+        "test_score": accuracy_score(y[start:stop], y_pred),
+        "oof_scores": oof_scores
+    }
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, progress_callback=None, output_dir=None):
         self.model_trainer_config = ModelTrainerConfig()
+        # Model files are written here; the training pipeline points it at a per-run staging folder and
+        # publishes them over the served artifacts only once training succeeds
+        self.output_dir = output_dir or self.model_trainer_config.artifact_folder
+        self.trained_model_path = os.path.join(self.output_dir, os.path.basename(self.model_trainer_config.trained_model_path))
+        self.inference_model_path = os.path.join(self.output_dir, os.path.basename(self.model_trainer_config.inference_model_path))
+        self.progress_callback = progress_callback or (lambda stage, status: None)
         self.utils = MainUtils()
-        self.models = {
+        self.models = self.get_candidate_models()
+        self.evaluation_results = {}
+
+    @staticmethod
+    def get_candidate_models() -> dict:
+        # Estimator libraries are imported here rather than at module level to keep imports of this module cheap
+        from xgboost import XGBClassifier
+        from sklearn.svm import SVC
+        from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+        return {
             'XGBClassifier': XGBClassifier(),
             'GradientBoostingClassifier': GradientBoostingClassifier(),
             'SVC': SVC(),
             'RandomForestClassifier': RandomForestClassifier()
         }
 
+    def get_evaluation_config(self) -> dict:
+        model_config = self.utils.read_yaml_file(self.model_trainer_config.model_config_file_path)
+        return model_config.get("model_evaluation", {}) or {}
+
+    @staticmethod
+    def dataset_fingerprint(*arrays) -> str:
+        return hashlib.sha256("|".join(MainUtils.fingerprint_array(array) for array in arrays).encode()).hexdigest()
+
+    def evaluation_cache_path(self, data_fingerprint: str, model_name: str, model: object) -> str:
+        params = {k: v for k, v in model.get_params().items() if k not in ("n_jobs", "verbose", "nthread")}
+        key = hashlib.sha256(f"{data_fingerprint}|{model_name}|{sorted(params.items())!r}".encode()).hexdigest()
+        return os.path.join(self.model_trainer_config.evaluation_cache_dir, f"{key}.pkl")
+
+    @staticmethod
+    def assign_folds(y: np.ndarray, evaluation_config: dict) -> Tuple[np.ndarray, int]:
+        # Fold id per row. With fewer than two folds a single 20% holdout is validated (id 0) and the
+        # remaining rows (id 1) are only ever used for fitting.
+        n_folds = evaluation_config.get("cv_folds") or 1
+        random_state = evaluation_config.get("random_state", 42)
+        fold_ids = np.empty(len(y), dtype=np.int64)
+        if n_folds < 2:
+            train_index, test_index = train_test_split(np.arange(len(y)), test_size=0.2, random_state=random_state)
+            fold_ids[test_index], fold_ids[train_index] = 0, 1
+            return fold_ids, 1
+        folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+        for fold, (_, test_index) in enumerate(folds.split(np.zeros(len(y)), y)):
+            fold_ids[test_index] = fold
+        return fold_ids, n_folds
+
+    @staticmethod
+    def write_fold_data(X: np.ndarray, y: np.ndarray, fold_ids: np.ndarray, n_folds: int) -> Tuple[str, list, np.ndarray]:
+        # One pass over the data: rows are written grouped by fold to .npy files that every worker maps read-only.
+        # The first n_folds - 1 folds are written a second time after the last one, so the fit rows of fold k
+        # (folds k+1, ..., k-1 wrapping around) are one contiguous range of the file and no worker copies them.
+        # The file is up to (2 - 1 / n_folds) times the data; the page cache shares it between workers.
+        order = np.argsort(fold_ids, kind="stable")
+        fold_bounds = [0] + np.cumsum(np.bincount(fold_ids)).tolist()
+        layout = np.concatenate([order, order[:fold_bounds[n_folds - 1]]])
+        fold_data_dir = tempfile.mkdtemp(prefix="cv-folds-")
+        for name, array in (("X.npy", X), ("y.npy", y)):
+            output = np.lib.format.open_memmap(
+                os.path.join(fold_data_dir, name), mode="w+", dtype=array.dtype, shape=(len(layout),) + array.shape[1:]
+            )
+            # Filled in blocks so the reordered copy never has to fit in memory at once
+            for start in range(0, len(layout), 65536):
+                output[start:start + 65536] = array[layout[start:start + 65536]]
+            output.flush()
+            del output
+        return fold_data_dir, fold_bounds, order
+
+    def prune_evaluation_cache(self, evaluation_config: dict) -> None:
+        # Least recently used results go first; cache hits touch their file, so the mtime is the last use
+        max_entries = evaluation_config.get("cache_max_entries", 64)
+        max_bytes = evaluation_config.get("cache_max_megabytes", 1024) * 1024 * 1024
+        cache_paths = glob.glob(os.path.join(self.model_trainer_config.evaluation_cache_dir, "*.pkl"))
+        entries = sorted(((os.stat(path), path) for path in cache_paths), key=lambda entry: entry[0].st_mtime, reverse=True)
+        kept_bytes = 0
+        for rank, (stat, path) in enumerate(entries):
+            kept_bytes += stat.st_size
+            if rank >= max_entries or kept_bytes > max_bytes:
+                os.remove(path)
+                logging.info(f"Pruned evaluation cache entry {path}")
+
     def evaluate_models(self, X, y, models):
         try:
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42
-            )
+            evaluation_config = self.get_evaluation_config()
+            fold_ids, n_folds = self.assign_folds(y, evaluation_config)
+            data_fingerprint = self.dataset_fingerprint(X, y, fold_ids)
+
             report = {}
+            pending = {}
+            # Per candidate: fold models, fold scores and out-of-fold scores (in fold order), kept for ensembling
+            self.evaluation_results = {}
             for model_name, model in models.items():
-                model.fit(X_train, y_train)
-                y_train_pred = model.predict(X_train)
-                y_test_pred = model.predict(X_test)
-                train_model_score = accuracy_score(y_train, y_train_pred)
-                test_model_score = accuracy_score(y_test, y_test_pred)
-                report[model_name] = test_model_score
-                logging.info(f"{model_name} - Train score: {train_model_score}, Test score: {test_model_score}")
-            return report
+                cache_path = self.evaluation_cache_path(data_fingerprint, model_name, model)
+                if os.path.exists(cache_path):
+                    result = self.utils.load_object(cache_path)
+                    os.utime(cache_path)
+                    report[model_name] = result["test_score"]
+                    self.evaluation_results[model_name] = result
+                    logging.info(f"{model_name} - cached CV score: {result['test_score']:.4f}, fold scores: {result['fold_scores']}")
+                else:
+                    pending[model_name] = cache_path
+
+            if pending:
+                cpu_count = os.cpu_count() or 1
+                n_tasks = len(pending) * n_folds
+                n_workers = max(1, min(n_tasks, evaluation_config.get("n_workers") or cpu_count))
+                default_threads = max(1, cpu_count // n_workers)
+                thread_budgets = evaluation_config.get("n_jobs") or {}
+                fold_data_dir, fold_bounds, order = self.write_fold_data(X, y, fold_ids, n_folds)
+                logging.info(f"Evaluating {list(pending)} on {n_folds} folds across {n_workers} worker processes")
+                try:
+                    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                        futures = [
+                            executor.submit(
+                                fit_and_score_fold, model_name, clone(models[model_name]),
+                                thread_budgets.get(model_name, default_threads),
+                                fold_data_dir, fold, fold_bounds
+                            )
+                            for model_name in pending
+                            for fold in range(n_folds)
+                        ]
+                        fold_results = {model_name: [None] * n_folds for model_name in pending}
+                        for future in futures:
+                            fold_result = future.result()
+                            fold_results[fold_result["model_name"]][fold_result["fold"]] = fold_result
+                finally:
+                    shutil.rmtree(fold_data_dir, ignore_errors=True)
+
+                for model_name, results in fold_results.items():
+                    # Out-of-fold scores are put back in the original row order; NaN where a row was never validated
+                    oof_scores = np.full(len(y), np.nan)
+                    oof_scores[order[:fold_bounds[n_folds]]] = np.concatenate([result["oof_scores"] for result in results])
+                    fold_scores = [round(float(result["test_score"]), 6) for result in results]
+                    result = {
+                        "test_score": float(np.mean(fold_scores)),
+                        "fold_scores": fold_scores,
+                        "models": [result["model"] for result in results],
+                        "oof_scores": oof_scores
+                    }
+                    report[model_name] = result["test_score"]
+                    self.evaluation_results[model_name] = result
+                    self.utils.save_object(pending[model_name], result)
+                    logging.info(f"{model_name} - CV score: {result['test_score']:.4f}, fold scores: {fold_scores}")
+                self.prune_evaluation_cache(evaluation_config)
+
+            return {model_name: report[model_name] for model_name in models}
         except Exception as e:
             logging.error(f"Error in evaluate_models: {str(e)}")
             raise CustomException(e, sys)
 
+    def build_ensemble(self, model_report: dict, y: np.ndarray) -> Tuple[object, float]:
+        # Combines the fold models already fitted by evaluate_models; returns (None, None) when disabled
+        ensemble_config = self.get_evaluation_config().get("ensemble") or {}
+        method = ensemble_config.get("method", "none")
+        if method in (None, "none"):
+            return None, None
+        if method not in ("voting", "stacking"):
+            raise CustomException(f"Unknown ensemble method '{method}'. Expected none, voting or stacking", sys)
+        members = ensemble_config.get("members") or sorted(model_report, key=model_report.get, reverse=True)[:ensemble_config.get("top_k", 3)]
+        if len(members) < 2:
+            return None, None
+
+        oof_scores = np.column_stack([self.evaluation_results[name]["oof_scores"] for name in members])
+        validated = ~np.isnan(oof_scores).any(axis=1)
+        oof_scores, y_validated = oof_scores[validated], y[validated]
+        classes = np.asarray(self.evaluation_results[members[0]]["models"][0].classes_)
+        meta_model = None
+        if method == "stacking":
+            from sklearn.linear_model import LogisticRegression
+            meta_model = LogisticRegression()
+            minority_rows = int(np.bincount(y_validated.astype(int)).min())
+            if minority_rows < 2:
+                logging.warning(f"Too few validated rows of the minority class ({minority_rows}) to fit a stacking ensemble")
+                return None, None
+            # The member scores are out-of-fold, so the meta model is scored on them with its own CV
+            folds = StratifiedKFold(n_splits=min(5, minority_rows), shuffle=True, random_state=42)
+            score = float(np.mean(cross_val_score(meta_model, oof_scores, y_validated, cv=folds)))
+            meta_model.fit(oof_scores, y_validated)
+        else:
+            score = accuracy_score(y_validated, classes[(oof_scores.mean(axis=1) >= 0.5).astype(int)])
+
+        ensemble = FoldEnsemble(
+            members={name: self.evaluation_results[name]["models"] for name in members},
+            method=method,
+            meta_model=meta_model
+        )
+        logging.info(f"{method} ensemble of {members}: CV score {score:.4f}")
+        return ensemble, score
+
     def get_best_model(self, x_train: np.ndarray, y_train: np.ndarray, x_test: np.ndarray, y_test: np.ndarray):
         try:
             model_report = self.evaluate_models(X=x_train, y=y_train, models=self.models)
@@ -65,20 +273,165 @@ class ModelTrainer:
             logging.error(f"Error in get_best_model: {str(e)}")
             raise CustomException(e, sys)
 
+    def read_search_config(self, best_model_name: str) -> Tuple[dict, dict]:
+        model_selection = self.utils.read_yaml_file(self.model_trainer_config.model_config_file_path)["model_selection"]
+        model_param_grid = model_selection["model"][best_model_name]["search_param_grid"]
+        # YAML has no None literal in these lists; "None" is written as a string in model.yaml
+        model_param_grid = {
+            param: [None if value == "None" else value for value in values]
+            for param, values in model_param_grid.items()
+        }
+        search_config = {
+            "strategy": "grid",
+            "cv": 5,
+            "n_iter": 20,
+            "time_budget_seconds": None,
+            "early_stopping_rounds": None,
+            "factor": 3,
+            "random_state": 42
+        }
+        search_config.update(model_selection.get("search", {}) or {})
+        return model_param_grid, search_config
+
+    def cross_validate_candidate(self, candidate: object, best_model_name: str, X_train: np.ndarray, y_train: np.ndarray, search_config: dict) -> Tuple[float, dict]:
+        early_stopping_rounds = search_config["early_stopping_rounds"]
+        if best_model_name != "XGBClassifier" or not early_stopping_rounds:
+            scores = cross_val_score(candidate, X_train, y_train, cv=search_config["cv"], n_jobs=-1)
+            return float(np.mean(scores)), {}
+
+        # Early stopping needs its own validation data, carved out of each training fold
+        folds = StratifiedKFold(n_splits=search_config["cv"], shuffle=True, random_state=search_config["random_state"])
+        scores, best_iterations = [], []
+        for train_index, test_index in folds.split(X_train, y_train):
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train[train_index], y_train[train_index], test_size=0.1, random_state=search_config["random_state"]
+            )
+            fold_model = clone(candidate).set_params(early_stopping_rounds=early_stopping_rounds)
+            fold_model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+            scores.append(accuracy_score(y_train[test_index], fold_model.predict(X_train[test_index])))
+            best_iterations.append(fold_model.best_iteration)
+        return float(np.mean(scores)), {"n_estimators": int(np.mean(best_iterations)) + 1}
+
+    def score_candidate(self, best_model_object: object, best_model_name: str, params: dict, X_train: np.ndarray, y_train: np.ndarray, search_config: dict) -> Tuple[float, dict]:
+        candidate_start = time.perf_counter()
+        candidate = clone(best_model_object).set_params(**params)
+        score, tuned_params = self.cross_validate_candidate(candidate, best_model_name, X_train, y_train, search_config)
+        params = {**params, **tuned_params}
+        logging.info(f"{best_model_name} candidate {params} on {len(y_train)} rows: cv score {score:.4f} in {time.perf_counter() - candidate_start:.2f}s")
+        return score, params
+
+    def refit_best_candidate(self, best_model_object: object, best_model_name: str, results: list, X_train: np.ndarray, y_train: np.ndarray) -> object:
+        best_score, best_params = max(results, key=lambda result: result[0])
+        logging.info(f"Best params for {best_model_name}: {best_params} (cv score {best_score:.4f})")
+        finetuned_model = clone(best_model_object).set_params(**best_params)
+        finetuned_model.fit(X_train, y_train)
+        return finetuned_model
+
+    def budgeted_search(self, best_model_object: object, best_model_name: str, candidates: list, X_train: np.ndarray, y_train: np.ndarray, search_config: dict) -> object:
+        # Scores candidates one by one until the list or the time budget runs out (at least one is always scored)
+        time_budget = search_config["time_budget_seconds"]
+        search_start = time.perf_counter()
+        results = []
+        for i, params in enumerate(candidates):
+            if results and time_budget and time.perf_counter() - search_start > time_budget:
+                logging.warning(f"Search time budget of {time_budget}s exhausted after {i} of {len(candidates)} candidates")
+                break
+            results.append(self.score_candidate(best_model_object, best_model_name, params, X_train, y_train, search_config))
+        return self.refit_best_candidate(best_model_object, best_model_name, results, X_train, y_train)
+
+    @staticmethod
+    def halving_rows(y: np.ndarray, n_rows: int, min_class_rows: int, random_state: int) -> np.ndarray:
+        # The first n_rows of a fixed shuffle, so each rung's rows contain the previous rung's, topped up so
+        # every class keeps min_class_rows (stratified folds need each class in every fold)
+        order = np.random.RandomState(random_state).permutation(len(y))
+        rows, rest = order[:n_rows], order[n_rows:]
+        for label in np.unique(y):
+            shortfall = min_class_rows - np.count_nonzero(y[rows] == label)
+            if shortfall > 0:
+                rows = np.concatenate([rows, rest[y[rest] == label][:shortfall]])
+        return np.sort(rows)
+
+    def halving_search(self, best_model_object: object, best_model_name: str, candidates: list, X_train: np.ndarray, y_train: np.ndarray, search_config: dict) -> object:
+        # Successive halving over training rows: every candidate is scored on a small sample and the best
+        # 1/factor go on to factor times as many rows, until the last rung uses all of them. XGBClassifier
+        # candidates use early stopping as in the other strategies. The time budget is checked before every
+        # candidate; once it is spent, the best candidate of the furthest rung reached is refitted.
+        factor = search_config["factor"]
+        time_budget = search_config["time_budget_seconds"]
+        n_rows = len(y_train)
+        n_rungs = 1 + int(np.log(len(candidates)) // np.log(factor)) if len(candidates) > 1 else 1
+        min_rows = 2 * search_config["cv"] * len(np.unique(y_train))
+        search_start = time.perf_counter()
+        results = []
+        for rung in range(n_rungs):
+            n_rung_rows = min(n_rows, max(min_rows, n_rows // factor ** (n_rungs - 1 - rung)))
+            rows = self.halving_rows(y_train, n_rung_rows, search_config["cv"], search_config["random_state"])
+            rung_results = []
+            for params in candidates:
+                if (rung_results or results) and time_budget and time.perf_counter() - search_start > time_budget:
+                    break
+                rung_results.append(self.score_candidate(best_model_object, best_model_name, params, X_train[rows], y_train[rows], search_config))
+            if rung_results:
+                results = rung_results
+            if len(rung_results) < len(candidates):
+                logging.warning(f"Search time budget of {time_budget}s exhausted in rung {rung + 1} of {n_rungs}")
+                break
+            ranked = sorted(range(len(candidates)), key=lambda i: rung_results[i][0], reverse=True)
+            # The configured params go on: n_estimators picked by early stopping is re-tuned on the larger sample
+            candidates = [candidates[i] for i in ranked[:max(1, -(-len(candidates) // factor))]]
+        return self.refit_best_candidate(best_model_object, best_model_name, results, X_train, y_train)
+
     def finetune_best_model(self, best_model_object: object, best_model_name: str, X_train: np.ndarray, y_train: np.ndarray) -> object:
         try:
-            model_param_grid = self.utils.read_yaml_file(self.model_trainer_config.model_config_file_path)["model_selection"]["model"][best_model_name]["search_param_grid"]
-            grid_search = GridSearchCV(best_model_object, param_grid=model_param_grid, cv=5, n_jobs=-1, verbose=1)
-            grid_search.fit(X_train, y_train)
-            best_params = grid_search.best_params_
-            logging.info(f"Best params for {best_model_name}: {best_params}")
-            finetuned_model = best_model_object.set_params(**best_params)
+            model_param_grid, search_config = self.read_search_config(best_model_name)
+            strategy = search_config["strategy"]
+            logging.info(f"Tuning {best_model_name} with {strategy} search: {search_config}")
+            search_start = time.perf_counter()
+
+            if strategy in ("random", "halving_random"):
+                n_candidates = min(search_config["n_iter"], len(ParameterGrid(model_param_grid)))
+                candidates = list(ParameterSampler(model_param_grid, n_iter=n_candidates, random_state=search_config["random_state"]))
+            elif strategy in ("grid", "halving_grid"):
+                candidates = list(ParameterGrid(model_param_grid))
+            else:
+                raise CustomException(f"Unknown search strategy '{strategy}'. Expected grid, halving_grid, halving_random or random", sys)
+
+            if strategy.startswith("halving"):
+                finetuned_model = self.halving_search(best_model_object, best_model_name, candidates, X_train, y_train, search_config)
+            else:
+                finetuned_model = self.budgeted_search(best_model_object, best_model_name, candidates, X_train, y_train, search_config)
+            logging.info(f"Search finished in {time.perf_counter() - search_start:.2f}s")
             return finetuned_model
         except Exception as e:
             logging.error(f"Error in finetune_best_model: {str(e)}")
             raise CustomException(e, sys)
 
-    def initiate_model_trainer(self, train_array, test_array):
+    def publishes_challenger(self, preprocessor_path: str = None) -> bool:
+        # A challenger needs a fused artifact and a fused champion to be compared against; otherwise publish as champion
+        if self.model_trainer_config.publish_mode != "challenger":
+            return False
+        if preprocessor_path is None or not os.path.exists(self.model_trainer_config.inference_model_path):
+            logging.warning("No fused champion model to shadow; publishing the trained model as champion")
+            return False
+        return True
+
+    def save_inference_model(self, best_model: object, best_model_name: str, preprocessor_path: str, as_challenger: bool = False) -> str:
+        preprocessor = self.utils.load_object(preprocessor_path)
+        inference_model = InferenceModel(
+            preprocessor=preprocessor,
+            model=best_model,
+            feature_names=preprocessor.feature_names_in_,
+            model_name=best_model_name
+        )
+        if as_challenger:
+            inference_model_path = os.path.join(self.model_trainer_config.challengers_dir, f"{inference_model.version}.pkl")
+        else:
+            inference_model_path = self.inference_model_path
+        self.utils.save_object(file_path=inference_model_path, obj=inference_model)
+        logging.info(f"Saved inference model version {inference_model.version} to {inference_model_path}")
+        return inference_model_path
+
+    def initiate_model_trainer(self, train_array, test_array, preprocessor_path: str = None):
         try:
             logging.info("Splitting training and testing input and target feature")
             x_train, y_train, x_test, y_test = (
@@ -88,20 +441,32 @@ class ModelTrainer:
                 test_array[:, -1]
             )
             logging.info("Evaluating models")
-            model_report = self.evaluate_models(X=x_train, y=y_train, models=self.models)
+            self.progress_callback("evaluation", "running")
+            with metrics.timer("wafer_pipeline_stage_duration_seconds", stage="evaluation"):
+                model_report = self.evaluate_models(X=x_train, y=y_train, models=self.models)
             best_model_score = max(model_report.values())
             best_model_name = max(model_report, key=model_report.get)
             best_model = self.models[best_model_name]
             logging.info(f"Best model: {best_model_name}, Score: {best_model_score}")
+            ensemble, ensemble_score = self.build_ensemble(model_report, y_train)
 
-            logging.info("Finetuning best model")
-            best_model = self.finetune_best_model(
-                best_model_name=best_model_name,
-                best_model_object=best_model,
-                X_train=x_train,
-                y_train=y_train
-            )
-            best_model.fit(x_train, y_train)
+            self.progress_callback("evaluation", "completed")
+            if ensemble is not None and ensemble_score > best_model_score:
+                # The ensemble is made of the already fitted fold models; there is nothing left to tune
+                best_model, best_model_name = ensemble, f"{ensemble.method.capitalize()}Ensemble"
+                logging.info(f"Using the {ensemble.method} ensemble (CV score {ensemble_score:.4f}) over {best_model_name}")
+                self.progress_callback("tuning", "skipped")
+            else:
+                logging.info("Finetuning best model")
+                self.progress_callback("tuning", "running")
+                with metrics.timer("wafer_pipeline_stage_duration_seconds", stage="tuning"):
+                    best_model = self.finetune_best_model(
+                        best_model_name=best_model_name,
+                        best_model_object=best_model,
+                        X_train=x_train,
+                        y_train=y_train
+                    )
+                self.progress_callback("tuning", "completed")
             y_pred = best_model.predict(x_test)
             best_model_score = accuracy_score(y_test, y_pred)
             logging.info(f"Final best model: {best_model_name}, Score: {best_model_score}")
@@ -109,12 +474,19 @@ class ModelTrainer:
             if best_model_score < 0.5:
                 raise CustomException("No best model found with accuracy >= 0.5", sys)
 
-            logging.info(f"Saving model to {self.model_trainer_config.trained_model_path}")
-            os.makedirs(os.path.dirname(self.model_trainer_config.trained_model_path), exist_ok=True)
+            if self.publishes_challenger(preprocessor_path):
+                # The served model files stay untouched until the challenger is promoted
+                self.save_inference_model(best_model, best_model_name, preprocessor_path, as_challenger=True)
+                return best_model_score
+
+            logging.info(f"Saving model to {self.trained_model_path}")
+            os.makedirs(os.path.dirname(self.trained_model_path), exist_ok=True)
             self.utils.save_object(
-                file_path=self.model_trainer_config.trained_model_path,
+                file_path=self.trained_model_path,
                 obj=best_model
             )
+            if preprocessor_path is not None:
+                self.save_inference_model(best_model, best_model_name, preprocessor_path)
             return best_model_score
         except Exception as e:
             logging.error(f"Error in initiate_model_trainer: {str(e)}")
@@ -0,0 +1,137 @@
+import sys
+import os
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from src.constant import *
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.schema import load_schema
+from dataclasses import dataclass
+
+
+@dataclass
+class WaferLoaderConfig:
+    mongo_url: str = os.getenv("MONGO_DB_URL", MONGO_DB_URL)
+    database_name: str = MONGO_DATABASE_NAME
+    collection_name: str = MONGO_COLLECTION_NAME
+    batch_size: int = int(os.getenv("UPLOAD_BATCH_SIZE", "1000"))
+    n_workers: int = int(os.getenv("UPLOAD_WORKERS", "4"))
+    # Documents are upserted on this field, so reloading a file updates wafers instead of duplicating them
+    id_field: str = "wafer_id"
+    # Set on every write; ingestion's default high-water mark, so updated wafers are picked up again,
+    # ordered on (updated_at, _id) since a whole file shares one timestamp, and only their latest row is read
+    updated_at_field: str = "updated_at"
+
+
+class WaferLoader:
+    def __init__(self, mongo_client=None, config: WaferLoaderConfig = None):
+        self.config = config or WaferLoaderConfig()
+        self.mongo_client = mongo_client
+        self.schema = load_schema()
+        self.stats = {"files": 0, "rows": 0, "batches": 0, "upserted": 0, "modified": 0, "matched": 0, "errors": 0}
+
+    @staticmethod
+    def resolve_files(paths: List[str]) -> List[str]:
+        # Accepts files, directories (all *.csv inside) and glob patterns
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(glob.glob(os.path.join(path, "*.csv")))
+            else:
+                files.extend(glob.glob(path))
+        return sorted(set(files))
+
+    def read_wafer_file(self, file_path: str) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        # Returns wafer ids, column names and a float64 matrix of the sensor (and target) values
+        df = pd.read_csv(file_path, dtype=self.schema.dtype_map(np.float64, include_target=True))
+        id_column = next((column for column in df.columns if column in (self.config.id_field, "Wafer") or str(column).startswith("Unnamed")), None)
+        if id_column is not None:
+            wafer_ids = df.pop(id_column).astype(str).to_numpy()
+        else:
+            # Files without an id column get deterministic ids so reloading them stays idempotent
+            file_stem = os.path.splitext(os.path.basename(file_path))[0]
+            wafer_ids = np.array([f"{file_stem}-{i}" for i in range(len(df))])
+        columns = [column for column in df.columns if column in self.schema.column_index or column == self.schema.target_column]
+        return wafer_ids, columns, df[columns].to_numpy(dtype=np.float64)
+
+    def rows_to_documents(self, wafer_ids: np.ndarray, columns: List[str], values: np.ndarray, updated_at: datetime) -> List[dict]:
+        # Built straight from the matrix: tolist() yields native floats in C, then only the missing
+        # cells are patched to None (stored as null)
+        rows = values.tolist()
+        for row, column in np.argwhere(np.isnan(values)).tolist():
+            rows[row][column] = None
+        keys = [self.config.id_field] + columns + [self.config.updated_at_field]
+        return [dict(zip(keys, [wafer_id, *row, updated_at])) for wafer_id, row in zip(wafer_ids.tolist(), rows)]
+
+    def write_batch(self, collection, documents: List[dict]) -> dict:
+        id_field = self.config.id_field
+        requests = [UpdateOne({id_field: document[id_field]}, {"$set": document}, upsert=True) for document in documents]
+        try:
+            result = collection.bulk_write(requests, ordered=False).bulk_api_result
+            errors = 0
+        except BulkWriteError as e:
+            # Unordered batches keep going past failing documents; count them and carry on
+            result = e.details
+            errors = len(result.get("writeErrors", []))
+            logging.error(f"Bulk write had {errors} failed documents, first: {result['writeErrors'][0].get('errmsg')}")
+        return {
+            "upserted": result.get("nUpserted", 0),
+            "modified": result.get("nModified", 0),
+            "matched": result.get("nMatched", 0),
+            "errors": errors,
+        }
+
+    def iter_batches(self, files: List[str]):
+        batch_size = self.config.batch_size
+        for file_path in files:
+            wafer_ids, columns, values = self.read_wafer_file(file_path)
+            updated_at = datetime.now(timezone.utc)
+            self.stats["files"] += 1
+            logging.info(f"Loading {len(wafer_ids)} wafers from {file_path}")
+            for start in range(0, len(wafer_ids), batch_size):
+                stop = start + batch_size
+                yield self.rows_to_documents(wafer_ids[start:stop], columns, values[start:stop], updated_at)
+
+    def load(self, paths: List[str]) -> dict:
+        try:
+            files = self.resolve_files(paths)
+            if not files:
+                raise CustomException(f"No CSV files matched {paths}", sys)
+            mongo_client = self.mongo_client or MongoClient(self.config.mongo_url)
+            collection = mongo_client[self.config.database_name][self.config.collection_name]
+            collection.create_index(self.config.id_field, unique=True)
+
+            start_time = time.perf_counter()
+            n_workers = self.config.n_workers
+            with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="wafer-loader") as executor:
+                pending = set()
+                for documents in self.iter_batches(files):
+                    # Bounded number of batches in flight so a large directory is never fully in memory
+                    if len(pending) >= 2 * n_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self.collect_results(done)
+                    self.stats["rows"] += len(documents)
+                    pending.add(executor.submit(self.write_batch, collection, documents))
+                self.collect_results(wait(pending).done)
+
+            elapsed = time.perf_counter() - start_time
+            self.stats["seconds"] = round(elapsed, 3)
+            self.stats["rows_per_second"] = round(self.stats["rows"] / elapsed, 1) if elapsed else None
+            logging.info(f"Wafer load finished: {self.stats}")
+            return self.stats
+        except Exception as e:
+            logging.error(f"Error in WaferLoader.load: {str(e)}")
+            raise CustomException(e, sys)
+
+    def collect_results(self, futures) -> None:
+        for future in futures:
+            for key, value in future.result().items():
+                self.stats[key] += value
+            self.stats["batches"] += 1
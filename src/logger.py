@@ -1,17 +1,137 @@
+import atexit
+import json
 import logging
 import os
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
 logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE)
 
-os.makedirs(logs_path, exist_ok=True)
-
 LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
\ No newline at end of file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+
+TEXT_LOG_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord carries; anything else was passed through extra= and goes into the JSON payload
+RESERVED_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "lineno": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock QueueHandler formats the message in the calling thread; leave that to the listener
+    # so %-style arguments are only rendered off the request path
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    # Opens the file (creating the log directory) on the first record instead of at import
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class LazyFileHandler(logging.FileHandler):
+    # Appends without ever rotating: only the process that owns a log file may rotate it
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class lazy:
+    # Defers an expensive log payload until a handler actually renders it,
+    # e.g. logging.debug("Rows:\n%s", lazy(df.head().to_string))
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args, **self.kwargs))
+
+
+def start_queue_logging(file_handler: logging.Handler) -> QueueListener:
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.handlers = [handler for handler in root_logger.handlers if handler is not file_handler and not isinstance(handler, DeferredQueueHandler)]
+    root_logger.addHandler(DeferredQueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    # Flush whatever is still queued when the interpreter exits
+    atexit.register(listener.stop)
+    return listener
+
+
+def log_formatter() -> logging.Formatter:
+    return JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_LOG_FORMAT)
+
+
+def rotating_file_handler(file_path: str) -> logging.Handler:
+    file_handler = LazyRotatingFileHandler(file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    file_handler.setFormatter(log_formatter())
+    return file_handler
+
+
+def configure_logging() -> logging.Handler:
+    file_handler = rotating_file_handler(LOG_FILE_PATH)
+    logging.getLogger().setLevel(LOG_LEVEL)
+
+    # Forked children have no listener thread, so they append to the parent's file directly (without
+    # rotating it, which would rename the file under the parent) until start_worker_logging() gives
+    # them their own file (long-lived serving workers)
+    def use_file_handler_in_child():
+        child_handler = LazyFileHandler(file_handler.baseFilename)
+        child_handler.setFormatter(file_handler.formatter)
+        root_logger = logging.getLogger()
+        root_logger.handlers = [handler for handler in root_logger.handlers if not isinstance(handler, DeferredQueueHandler)] + [child_handler]
+    os.register_at_fork(after_in_child=use_file_handler_in_child)
+    return file_handler
+
+
+def start_worker_logging() -> QueueListener:
+    # Every gunicorn worker inherits LOG_FILE_PATH from the preloaded master; rotating one file from several
+    # processes loses lines, so each worker writes and rotates its own <log>-<pid>.log next to it
+    global log_file_handler, log_listener
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, LazyFileHandler):
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+    log_file_handler = rotating_file_handler(f"{os.path.splitext(LOG_FILE_PATH)[0]}-{os.getpid()}.log")
+    log_listener = start_queue_logging(log_file_handler)
+    return log_listener
+
+
+log_file_handler = configure_logging()
+log_listener = start_queue_logging(log_file_handler)
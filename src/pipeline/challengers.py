@@ -0,0 +1,237 @@
+import sys
+import os
+import glob
+import time
+import shutil
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+import numpy as np
+from src.constant import *
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.model_registry import model_registry
+from src.pipeline.training_jobs import TrainingInProgressError, training_job_manager
+from src.utils.main_utils import MainUtils
+from src.utils.metrics import metrics
+from src.utils.stage_cache import StageCache
+
+
+@dataclass
+class ChallengerConfig:
+    challengers_dir: str = challenger_folder
+    # Champions replaced by a promotion are kept here (not scored) so they can be promoted back
+    retired_dirname: str = "retired"
+    shadow_enabled: bool = os.getenv("SHADOW_SCORING_ENABLED", "1") == "1"
+    shadow_workers: int = int(os.getenv("SHADOW_WORKERS", "1"))
+    # Batches beyond this many waiting for shadow scoring are dropped, so slow challengers never back up memory
+    max_pending_batches: int = int(os.getenv("SHADOW_MAX_PENDING_BATCHES", "16"))
+    # Seconds between scans of the challengers folder
+    discovery_interval: float = float(os.getenv("CHALLENGER_DISCOVERY_INTERVAL", "5.0"))
+
+
+@dataclass
+class ChallengerStats:
+    version: str = None
+    model_name: str = None
+    batches: int = 0
+    rows: int = 0
+    agreed_rows: int = 0
+    seconds: float = 0.0
+    # Challenger and champion time on the batches the champion scored in full (not partly from the
+    # prediction cache), for a like-for-like latency comparison
+    timed_seconds: float = 0.0
+    champion_seconds: float = 0.0
+    errors: int = 0
+    last_error: str = None
+    last_scored_at: str = None
+
+    def to_dict(self) -> dict:
+        stats = asdict(self)
+        stats["agreement"] = self.agreed_rows / self.rows if self.rows else None
+        stats["mean_batch_seconds"] = self.seconds / self.batches if self.batches else None
+        stats["latency_ratio"] = self.timed_seconds / self.champion_seconds if self.champion_seconds else None
+        return stats
+
+
+class ChallengerManager:
+    # The champion answers requests; every model in the challengers folder scores the same batches on a
+    # background thread pool and its agreement with the champion and latency are recorded per worker.
+    def __init__(self, config: ChallengerConfig = None):
+        self.config = config or ChallengerConfig()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._stats = {}
+        self._paths = {}
+        self._discovered_at = float("-inf")
+        # (champion version, challenger version) -> whether both apply the same preprocessing
+        self._shared_preprocessing = {}
+        # Executor threads do not survive a fork; each worker starts its own pool on first use
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    def challenger_paths(self, refresh: bool = False) -> dict:
+        now = time.monotonic()
+        if refresh or now - self._discovered_at >= self.config.discovery_interval:
+            paths = sorted(glob.glob(os.path.join(self.config.challengers_dir, "*.pkl")))
+            self._paths = {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
+            self._discovered_at = now
+        return self._paths
+
+    def shadow(self, features: np.ndarray, champion_predictions: np.ndarray, champion_seconds: float,
+               champion: object = None, transformed: np.ndarray = None) -> bool:
+        # Called on the response path: only hands the batch to the pool, never waits for it.
+        # champion_seconds is None when the champion's predictions partly came from the prediction cache.
+        if not self.config.shadow_enabled or not self.challenger_paths():
+            return False
+        with self._lock:
+            if self._pending >= self.config.max_pending_batches:
+                metrics.inc("wafer_shadow_batches_total", result="dropped")
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.config.shadow_workers, thread_name_prefix="shadow-scoring")
+            self._pending += 1
+            executor = self._executor
+        executor.submit(self._score_challengers, features, champion_predictions, champion_seconds, champion, transformed)
+        return True
+
+    def _score_challengers(self, features, champion_predictions, champion_seconds, champion, transformed) -> None:
+        try:
+            for name, path in list(self.challenger_paths().items()):
+                self._score_challenger(name, path, features, champion_predictions, champion_seconds, champion, transformed)
+            metrics.inc("wafer_shadow_batches_total", result="scored")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _score_challenger(self, name, path, features, champion_predictions, champion_seconds, champion, transformed) -> None:
+        try:
+            challenger = model_registry.get(path)
+            if not hasattr(challenger, "transform"):
+                raise ValueError(f"{path} is not an inference model")
+            start = time.perf_counter()
+            if transformed is not None and self.shares_preprocessing(champion, challenger):
+                predictions = challenger.model.predict(transformed)
+            else:
+                predictions = challenger.predict(features)
+            seconds = time.perf_counter() - start
+            agreed_rows = int(np.count_nonzero(np.asarray(predictions) == np.asarray(champion_predictions)))
+            with self._lock:
+                stats = self._challenger_stats(name, challenger)
+                stats.batches += 1
+                stats.rows += len(predictions)
+                stats.agreed_rows += agreed_rows
+                stats.seconds += seconds
+                if champion_seconds is not None:
+                    stats.timed_seconds += seconds
+                    stats.champion_seconds += champion_seconds
+                stats.last_scored_at = datetime.now().isoformat(timespec="seconds")
+            metrics.observe("wafer_shadow_predict_duration_seconds", seconds, challenger=name)
+            metrics.inc("wafer_shadow_rows_total", agreed_rows, challenger=name, result="agree")
+            metrics.inc("wafer_shadow_rows_total", len(predictions) - agreed_rows, challenger=name, result="disagree")
+        except Exception as e:
+            # A broken challenger must not affect serving or the other challengers
+            logging.warning(f"Shadow scoring with challenger {name} failed: {str(e)}")
+            with self._lock:
+                stats = self._stats.setdefault(name, ChallengerStats())
+                stats.errors += 1
+                stats.last_error = str(e)
+            metrics.inc("wafer_shadow_errors_total", challenger=name)
+
+    def _challenger_stats(self, name: str, challenger: object) -> ChallengerStats:
+        stats = self._stats.get(name)
+        if stats is None or stats.version not in (None, challenger.version):
+            # A replaced challenger file starts a fresh comparison
+            stats = self._stats[name] = ChallengerStats()
+        stats.version, stats.model_name = challenger.version, challenger.model_name
+        return stats
+
+    def shares_preprocessing(self, champion: object, challenger: object) -> bool:
+        # Challengers trained on the same preprocessing reuse the champion's transformed batch
+        if champion is None:
+            return False
+        key = (champion.version, challenger.version)
+        if key not in self._shared_preprocessing:
+            self._shared_preprocessing[key] = champion.feature_names == challenger.feature_names and all(
+                (a is None and b is None) or (a is not None and b is not None and np.array_equal(a, b))
+                for a, b in (
+                    (getattr(champion, "selected_indices", None), getattr(challenger, "selected_indices", None)),
+                    (champion.fill_values, challenger.fill_values),
+                    (champion.mean, challenger.mean),
+                    (champion.scale, challenger.scale),
+                )
+            )
+        return self._shared_preprocessing[key]
+
+    def describe(self) -> dict:
+        champion = model_registry.get_inference_model()
+        paths = self.challenger_paths(refresh=True)
+        with self._lock:
+            challengers = {name: self._stats.get(name, ChallengerStats()).to_dict() for name in paths}
+            pending = self._pending
+        return {
+            "champion": None if champion is None else {"version": champion.version, "model_name": champion.model_name, "created_at": champion.created_at},
+            "challengers": challengers,
+            "shadow_enabled": self.config.shadow_enabled,
+            "pending_batches": pending,
+            "pid": os.getpid(),
+        }
+
+    def promote(self, name: str) -> dict:
+        # Accepts a challenger name or the version of a retired champion (rollback); None when neither exists
+        try:
+            retired_dir = os.path.join(self.config.challengers_dir, self.config.retired_dirname)
+            path = self.challenger_paths(refresh=True).get(name)
+            if path is None and os.path.exists(os.path.join(retired_dir, f"{name}.pkl")):
+                path = os.path.join(retired_dir, f"{name}.pkl")
+            if path is None:
+                return None
+            challenger = model_registry.get(path)
+            if not hasattr(challenger, "transform"):
+                raise CustomException(f"{path} is not an inference model and cannot be promoted", sys)
+            if getattr(challenger, "preprocessor", None) is None:
+                raise CustomException(f"{path} was saved without its preprocessor and cannot be promoted", sys)
+            # A training run publishes over the same files, so the two never interleave
+            with training_job_manager.training_lock(blocking=False):
+                inference_model_path = model_registry.config.inference_model_path
+                retired_path = None
+                champion = model_registry.get_inference_model()
+                if champion is not None:
+                    os.makedirs(retired_dir, exist_ok=True)
+                    retired_path = os.path.join(retired_dir, f"{champion.version}.pkl")
+                    shutil.copy2(inference_model_path, retired_path)
+                model_registry.promote(path, inference_model_path)
+                # model.pkl and scaler.pkl follow the champion (in the order training publishes them), and cached
+                # training outputs are dropped so a training run with unchanged inputs retrains instead of
+                # restoring and republishing the model this promotion replaced
+                utils = MainUtils()
+                utils.save_object(model_registry.config.model_file_path, challenger.model)
+                utils.save_object(model_registry.config.preprocessor_path, challenger.preprocessor)
+                StageCache().invalidate("training")
+            with self._lock:
+                stats = self._stats.pop(name, None)
+                self._discovered_at = float("-inf")
+            logging.info(f"Challenger {name} (version {challenger.version}) promoted to champion; previous champion kept at {retired_path}")
+            return {
+                "champion": {"version": challenger.version, "model_name": challenger.model_name},
+                "retired": retired_path,
+                "shadow_stats": None if stats is None else stats.to_dict(),
+            }
+        except TrainingInProgressError:
+            raise
+        except Exception as e:
+            logging.error(f"Error in ChallengerManager.promote: {str(e)}")
+            raise CustomException(e, sys)
+
+
+challenger_manager = ChallengerManager()
+metrics.describe("wafer_shadow_batches_total", "Batches handed to shadow scoring by result")
+metrics.describe("wafer_shadow_rows_total", "Rows scored by challengers by agreement with the champion")
+metrics.describe("wafer_shadow_errors_total", "Failed shadow scoring attempts by challenger")
+metrics.describe("wafer_shadow_predict_duration_seconds", "Challenger scoring latency per batch")
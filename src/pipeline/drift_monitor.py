@@ -0,0 +1,243 @@
+import os
+import threading
+from datetime import datetime
+from typing import List
+import numpy as np
+from dataclasses import dataclass
+from src.logger import logging
+from src.pipeline.model_registry import model_registry
+from src.utils.drift_baseline import DriftBaseline, bin_counts, normal_baseline
+from src.utils.schema import load_schema
+
+
+@dataclass
+class DriftMonitorConfig:
+    enabled: bool = os.getenv("DRIFT_MONITOR_ENABLED", "1") == "1"
+    # Bins used for the PSI when the preprocessor was fitted without a training histogram
+    n_bins: int = int(os.getenv("DRIFT_BINS", "10"))
+    # Every n-th scored row (counted across batches) is folded into the statistics. Binning costs about as
+    # much per row as scoring, so sampling is what keeps the monitor within a few percent of scoring time.
+    sample_every: int = int(os.getenv("DRIFT_SAMPLE_EVERY", "32"))
+    # Conventional PSI reading: < 0.1 stable, 0.1-0.2 moderate shift, > 0.2 significant shift
+    psi_threshold: float = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+    # Sampled readings a sensor needs before its PSI is reported; below that the PSI is mostly sampling noise
+    min_samples: int = int(os.getenv("DRIFT_MIN_SAMPLES", "200"))
+    top_n: int = 20
+
+
+@dataclass
+class DriftReference:
+    # Training distribution of the sensors the model sees, as fitted by the StandardScaler
+    version: str
+    feature_names: List[str]
+    selected_indices: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    # Sensors that were constant (or never observed) in training have no distribution to compare against
+    constant: np.ndarray
+    # Training bin edges and shares per sensor
+    baseline: DriftBaseline
+
+
+class DriftAggregates:
+    # Running per-sensor aggregates in standardised units, one row of each array per sensor
+    def __init__(self, n_features: int, n_bins: int):
+        self.rows = 0
+        # Rows actually folded into the statistics
+        self.sampled_rows = 0
+        self.batches = 0
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.observed = np.zeros(n_features, dtype=np.int64)
+        self.missing = np.zeros(n_features, dtype=np.int64)
+        self.z_sum = np.zeros(n_features)
+        self.z_sumsq = np.zeros(n_features)
+        self.bins = np.zeros((n_features, n_bins), dtype=np.int64)
+
+
+class DriftMonitor:
+    # Compares scored inputs with the training distribution stored in the fitted preprocessor: the scaler's
+    # mean_/var_ and the per-sensor histogram (quantile edges and shares) fitted next to it. Each batch is
+    # standardised with the training mean/std and binned against those edges with a handful of vectorised
+    # comparisons. Preprocessors fitted without a histogram fall back to standard normal quantiles.
+    # Statistics are per worker process and restart when the served model changes.
+    def __init__(self, config: DriftMonitorConfig = None):
+        self.config = config or DriftMonitorConfig()
+        self._lock = threading.Lock()
+        self._reference = None
+        self._aggregates = None
+        # Position of the next sampled row within the next batch
+        self._sample_offset = 0
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self) -> None:
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def load_baseline(self, baseline: DriftBaseline, n_features: int) -> DriftBaseline:
+        return baseline if baseline is not None else normal_baseline(n_features, self.config.n_bins)
+
+    def load_reference(self) -> DriftReference:
+        inference_model = model_registry.get_inference_model()
+        if inference_model is not None:
+            baseline = self.load_baseline(getattr(inference_model, "drift_baseline", None), len(inference_model.mean))
+            return DriftReference(
+                version=inference_model.version,
+                feature_names=inference_model.selected_feature_names,
+                selected_indices=getattr(inference_model, "selected_indices", None),
+                mean=inference_model.mean,
+                std=inference_model.scale,
+                constant=baseline.observed == 0,
+                baseline=baseline,
+            )
+        preprocessor = model_registry.get_preprocessor()
+        steps = dict(preprocessor.steps) if hasattr(preprocessor, "steps") else {"scaler": preprocessor}
+        scaler, selector = steps["scaler"], steps.get("selector")
+        feature_names = load_schema().sensor_columns
+        selected_indices = None if selector is None else np.asarray(selector.selected_indices_)
+        if selected_indices is not None:
+            feature_names = [feature_names[i] for i in selected_indices]
+        variance = np.asarray(scaler.var_, dtype=np.float64)
+        baseline = self.load_baseline(getattr(preprocessor, "drift_baseline_", None), len(variance))
+        return DriftReference(
+            version=str(model_registry.version(model_registry.config.preprocessor_path)),
+            feature_names=feature_names,
+            selected_indices=selected_indices,
+            mean=np.asarray(scaler.mean_, dtype=np.float64),
+            # Constant training columns get a unit scale, as in StandardScaler
+            std=np.where(variance > 0, np.sqrt(variance), 1.0),
+            constant=(variance == 0) | (baseline.observed == 0),
+            baseline=baseline,
+        )
+
+    def reference(self) -> DriftReference:
+        inference_model = model_registry.get_inference_model()
+        if inference_model is not None:
+            version = inference_model.version
+        else:
+            model_registry.get_preprocessor()
+            version = str(model_registry.version(model_registry.config.preprocessor_path))
+        if self._reference is None or self._reference.version != version:
+            with self._lock:
+                if self._reference is None or self._reference.version != version:
+                    self._reference = self.load_reference()
+                    self._aggregates = DriftAggregates(len(self._reference.mean), self._reference.baseline.n_bins)
+                    logging.info(f"Drift monitor reset for reference version {self._reference.version}")
+        return self._reference
+
+    def batch_statistics(self, X: np.ndarray, reference: DriftReference) -> tuple:
+        if reference.selected_indices is not None:
+            X = X[:, reference.selected_indices]
+        # Standardised in float64 (raw readings can be large relative to their spread), binned in float32
+        Z = ((X - reference.mean) / reference.std).astype(np.float32)
+        nan_mask = np.isnan(Z)
+        missing = np.count_nonzero(nan_mask, axis=0)
+        observed = len(Z) - missing
+        bins = bin_counts(Z, reference.baseline.edges, observed)
+        np.copyto(Z, 0, where=nan_mask)
+        return len(Z), observed, missing, Z.sum(axis=0, dtype=np.float64), np.einsum("ij,ij->j", Z, Z, dtype=np.float64), bins
+
+    def observe(self, features: np.ndarray) -> None:
+        # Runs inline on every scored batch; a failure here is logged and never fails the prediction
+        if not self.config.enabled or len(features) == 0:
+            return
+        try:
+            reference = self.reference()
+            with self._lock:
+                start = self._sample_offset
+                self._sample_offset = (start - len(features)) % self.config.sample_every
+            sample = np.asarray(features)[start::self.config.sample_every]
+            if len(sample) == 0:
+                with self._lock:
+                    if self._reference is reference:
+                        self._aggregates.rows += len(features)
+                        self._aggregates.batches += 1
+                return
+            sampled_rows, observed, missing, z_sum, z_sumsq, bins = self.batch_statistics(sample, reference)
+            with self._lock:
+                if self._reference is not reference:
+                    return
+                aggregates = self._aggregates
+                aggregates.rows += len(features)
+                aggregates.sampled_rows += sampled_rows
+                aggregates.batches += 1
+                aggregates.observed += observed
+                aggregates.missing += missing
+                aggregates.z_sum += z_sum
+                aggregates.z_sumsq += z_sumsq
+                aggregates.bins += bins
+        except Exception as e:
+            logging.warning(f"Drift monitor skipped a batch: {str(e)}")
+
+    def summary(self, top_n: int = None) -> dict:
+        # Sensors ordered by PSI; top_n=0 returns all of them
+        with self._lock:
+            reference, aggregates = self._reference, self._aggregates
+            if aggregates is not None:
+                rows, sampled_rows, batches, started_at = aggregates.rows, aggregates.sampled_rows, aggregates.batches, aggregates.started_at
+                observed, missing = aggregates.observed.copy(), aggregates.missing.copy()
+                z_sum, z_sumsq, bins = aggregates.z_sum.copy(), aggregates.z_sumsq.copy(), aggregates.bins.copy()
+        if aggregates is None or sampled_rows == 0:
+            return {
+                "reference_version": None if reference is None else reference.version,
+                "rows": 0 if aggregates is None else int(rows),
+                "sensors": [],
+                "pid": os.getpid(),
+            }
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_shift = z_sum / observed
+            variance_ratio = z_sumsq / observed - mean_shift ** 2
+            observed_share = bins / observed[:, None]
+        expected_share = np.clip(reference.baseline.shares, 1e-4, None)
+        clipped = np.clip(observed_share, 1e-4, None)
+        psi = np.sum((clipped - expected_share) * np.log(clipped / expected_share), axis=1)
+        psi[(observed < self.config.min_samples) | reference.constant] = np.nan
+
+        order = np.argsort(np.nan_to_num(-psi, nan=np.inf), kind="stable")
+        top_n = self.config.top_n if top_n is None else top_n
+        if top_n:
+            order = order[:top_n]
+
+        def value(x):
+            return None if not np.isfinite(x) else round(float(x), 6)
+
+        sensors = [
+            {
+                "sensor": reference.feature_names[i],
+                "psi": value(psi[i]),
+                # Shift of the mean in training standard deviations and ratio of the variances
+                "mean_shift": value(mean_shift[i]),
+                "variance_ratio": value(variance_ratio[i]),
+                "mean": value(reference.mean[i] + mean_shift[i] * reference.std[i]),
+                "train_mean": value(reference.mean[i]),
+                "nan_rate": value(missing[i] / sampled_rows),
+                "bins": [value(share) for share in observed_share[i]],
+                "train_bins": [value(share) for share in reference.baseline.shares[i]],
+            }
+            for i in order
+        ]
+        return {
+            "reference_version": reference.version,
+            "since": started_at,
+            "rows": int(rows),
+            "sampled_rows": int(sampled_rows),
+            "batches": int(batches),
+            "n_sensors": int(np.count_nonzero(~reference.constant)),
+            # None until at least one sensor has min_samples readings, so an early batch cannot raise an alarm
+            "n_drifted": int(np.count_nonzero(psi > self.config.psi_threshold)) if np.isfinite(psi).any() else None,
+            "psi_threshold": self.config.psi_threshold,
+            "min_samples": self.config.min_samples,
+            "sensors": sensors,
+            "pid": os.getpid(),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reference = None
+            self._aggregates = None
+
+
+drift_monitor = DriftMonitor()
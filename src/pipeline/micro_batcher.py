@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+import queue
+import threading
+import numpy as np
+from concurrent.futures import Future
+from dataclasses import dataclass
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class MicroBatcherConfig:
+    max_batch_size: int = int(os.getenv("MICRO_BATCH_MAX_SIZE", "256"))
+    max_wait_ms: float = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, config: MicroBatcherConfig = None):
+        self.predict_fn = predict_fn
+        self.config = config or MicroBatcherConfig()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+                logging.info(f"Micro-batcher started with {self.config}")
+
+    def submit(self, features: np.ndarray) -> Future:
+        # A worker thread does not survive fork (gunicorn workers) and can die on an unexpected error
+        if self._worker is None or not self._worker.is_alive():
+            self.start()
+        future = Future()
+        self._queue.put((np.atleast_2d(features), future))
+        return future
+
+    def predict(self, features: np.ndarray, timeout: float = None) -> np.ndarray:
+        try:
+            return self.submit(features).result(timeout=timeout)
+        except Exception as e:
+            logging.error(f"Error in MicroBatcher.predict: {str(e)}")
+            raise CustomException(e, sys)
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        batch_rows = len(batch[0][0])
+        deadline = time.monotonic() + self.config.max_wait_ms / 1000.0
+        while batch_rows < self.config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            batch_rows += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            futures = [future for _, future in batch]
+            try:
+                features = np.concatenate([features for features, _ in batch], axis=0)
+                predictions = np.asarray(self.predict_fn(features))
+                offsets = np.cumsum([len(features) for features, _ in batch])[:-1]
+                for future, result in zip(futures, np.split(predictions, offsets)):
+                    future.set_result(result)
+                logging.debug("Micro-batch scored %d rows from %d requests", len(features), len(batch))
+            except Exception as e:
+                logging.error(f"Error in micro-batch scoring: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
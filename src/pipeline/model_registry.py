@@ -0,0 +1,157 @@
+import sys
+import os
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from src.constant import *
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.main_utils import MainUtils
+
+
+@dataclass
+class ModelRegistryConfig:
+    model_file_path: str = os.path.join(artifact_folder, 'model.pkl')
+    preprocessor_path: str = os.path.join(artifact_folder, 'scaler.pkl')
+    inference_model_path: str = os.path.join(artifact_folder, 'inference_model.pkl')
+    # "mtime" compares (mtime, size); "hash" compares the sha256 of the file contents
+    reload_strategy: str = os.getenv("MODEL_RELOAD_STRATEGY", "mtime")
+    # Minimum number of seconds between two freshness checks of the same artifact
+    reload_check_interval: float = float(os.getenv("MODEL_RELOAD_CHECK_INTERVAL", "1.0"))
+
+
+@dataclass
+class RegistryEntry:
+    signature: tuple
+    obj: object
+    checked_at: float
+
+
+class ModelRegistry:
+    def __init__(self, config: ModelRegistryConfig = None):
+        self.config = config or ModelRegistryConfig()
+        self.utils = MainUtils()
+        self._lock = threading.RLock()
+        self._entries = {}
+        # A lock held by another thread at fork time would stay locked forever in the child
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self) -> None:
+        self._lock = threading.RLock()
+
+    def _file_signature(self, file_path: str) -> tuple:
+        stat = os.stat(file_path)
+        if self.config.reload_strategy == "hash":
+            sha = hashlib.sha256()
+            with open(file_path, "rb") as file_obj:
+                for block in iter(lambda: file_obj.read(1 << 20), b""):
+                    sha.update(block)
+            return (sha.hexdigest(),)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path: str) -> object:
+        try:
+            entry = self._entries.get(file_path)
+            now = time.monotonic()
+            if entry is not None and now - entry.checked_at < self.config.reload_check_interval:
+                return entry.obj
+
+            with self._lock:
+                entry = self._entries.get(file_path)
+                if entry is not None and now - entry.checked_at < self.config.reload_check_interval:
+                    return entry.obj
+                signature = self._file_signature(file_path)
+                if entry is None or entry.signature != signature:
+                    logging.info(f"Loading artifact into model registry: {file_path}")
+                    obj = self.utils.load_object(file_path)
+                    entry = RegistryEntry(signature=signature, obj=obj, checked_at=now)
+                else:
+                    entry.checked_at = now
+                self._entries[file_path] = entry
+                return entry.obj
+        except Exception as e:
+            logging.error(f"Error in ModelRegistry.get: {str(e)}")
+            raise CustomException(e, sys)
+
+    def get_inference_model(self) -> object:
+        # The fused artifact is only present for models trained with the imputing preprocessor
+        if not os.path.exists(self.config.inference_model_path):
+            return None
+        return self.get(self.config.inference_model_path)
+
+    def get_model(self) -> object:
+        return self.get(self.config.model_file_path)
+
+    def get_preprocessor(self) -> object:
+        return self.get(self.config.preprocessor_path)
+
+    def version(self, file_path: str) -> tuple:
+        entry = self._entries.get(file_path)
+        return entry.signature if entry is not None else None
+
+    def warm_up(self) -> None:
+        try:
+            logging.info("Warming up model registry")
+            if self.get_inference_model() is None:
+                self.get_model()
+                self.get_preprocessor()
+            logging.info("Model registry warm-up completed")
+        except Exception as e:
+            logging.error(f"Error in ModelRegistry.warm_up: {str(e)}")
+            raise CustomException(e, sys)
+
+    def is_ready(self) -> bool:
+        if self.config.inference_model_path in self._entries:
+            return True
+        return self.config.model_file_path in self._entries and self.config.preprocessor_path in self._entries
+
+    def changed_artifacts(self) -> list:
+        # Compares the served artifacts against disk without loading anything
+        changed = []
+        for file_path in (self.config.inference_model_path, self.config.model_file_path, self.config.preprocessor_path):
+            entry = self._entries.get(file_path)
+            if not os.path.exists(file_path):
+                if entry is not None:
+                    changed.append(file_path)
+            elif entry is None:
+                if file_path == self.config.inference_model_path:
+                    changed.append(file_path)
+            elif self._file_signature(file_path) != entry.signature:
+                changed.append(file_path)
+        return changed
+
+    def refresh(self) -> None:
+        # Forget artifacts that were removed or replaced, then load whatever warm-up needs. Replaced files
+        # that are no longer served (model.pkl and scaler.pkl once a fused model exists) stay unloaded,
+        # so changed_artifacts() doesn't keep reporting them.
+        with self._lock:
+            for file_path in list(self._entries):
+                if not os.path.exists(file_path) or self._file_signature(file_path) != self._entries[file_path].signature:
+                    del self._entries[file_path]
+        self.warm_up()
+
+    def promote(self, source_path: str, target_path: str) -> object:
+        # Moves source over target and hands its already loaded object to target. The rename is atomic
+        # on one filesystem and the entry swap is a single dict assignment, so concurrent readers see
+        # either the old or the new model, never a mix; other processes pick the file up on their next check.
+        try:
+            with self._lock:
+                obj = self.get(source_path)
+                os.replace(source_path, target_path)
+                self._entries[target_path] = RegistryEntry(
+                    signature=self._file_signature(target_path), obj=obj, checked_at=time.monotonic()
+                )
+                self._entries.pop(source_path, None)
+            logging.info(f"Promoted {source_path} to {target_path}")
+            return obj
+        except Exception as e:
+            logging.error(f"Error in ModelRegistry.promote: {str(e)}")
+            raise CustomException(e, sys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+model_registry = ModelRegistry()
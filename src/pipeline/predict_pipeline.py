@@ -1,13 +1,23 @@
 import sys
 import os
+import time
+import itertools
+import shutil
+import tempfile
 import pandas as pd
 import numpy as np
-from sklearn.metrics import accuracy_score
 from src.exception import CustomException
 from src.logger import logging
-from flask import request
 from src.constant import *
 from src.utils.main_utils import MainUtils
+from src.pipeline.model_registry import model_registry
+from src.pipeline.prediction_cache import prediction_cache
+from src.pipeline.challengers import challenger_manager
+from src.pipeline.drift_monitor import drift_monitor
+from src.utils.schema import SchemaValidationError, load_schema
+from src.utils.metrics import metrics
+
+PREDICTION_STEP_METRIC = "wafer_prediction_step_duration_seconds"
 from dataclasses import dataclass
 
 @dataclass
@@ -16,78 +26,228 @@ class PredictionPipelineConfig:
     prediction_file_name: str = "predictions_file.csv"
     model_file_path: str = os.path.join(artifact_folder, 'model.pkl')  # Fixed typo
     preprocessor_path: str = os.path.join(artifact_folder, 'scaler.pkl')  # Fixed typo
+    inference_model_path: str = os.path.join(artifact_folder, 'inference_model.pkl')
     prediction_file_path: str = os.path.join(prediction_output_dirname, prediction_file_name)
+    # Number of rows read, scored and written at a time; bounds peak memory for large uploads
+    prediction_chunk_size: int = int(os.getenv("PREDICTION_CHUNK_SIZE", "10000"))
+    # Each request scores into its own temporary directory under this root (system temp dir when unset)
+    prediction_workspace_root: str = os.getenv("PREDICTION_WORKSPACE_DIR")
+    response_block_size: int = 64 * 1024
 
 class PredictionPipeline:
-    def __init__(self, request: request):
+    def __init__(self, request):
         self.request = request
         self.utils = MainUtils()
         self.predictions_pipeline_config = PredictionPipelineConfig()
+        self.schema = load_schema()
 
-    def save_input_files(self) -> str:
-        try:
-            pred_file_input_dir = 'prediction_artifacts'
-            os.makedirs(pred_file_input_dir, exist_ok=True)
-            input_csv_file = self.request.files['file']
-            pred_file_path = os.path.join(pred_file_input_dir, input_csv_file.filename)
-            input_csv_file.save(pred_file_path)
-            logging.info(f"Input file saved to {pred_file_path}")
-            return pred_file_path
-        except Exception as e:
-            logging.error(f"Error in save_input_files: {str(e)}")
-            raise CustomException(e, sys)
+    def create_workspace(self) -> str:
+        workspace_root = self.predictions_pipeline_config.prediction_workspace_root
+        if workspace_root:
+            os.makedirs(workspace_root, exist_ok=True)
+        return tempfile.mkdtemp(prefix="predict-", dir=workspace_root)
+
+    @staticmethod
+    def remove_workspace(workspace_dir: str) -> None:
+        shutil.rmtree(workspace_dir, ignore_errors=True)
+
+    def iter_file_blocks(self, file_path: str):
+        with open(file_path, "rb") as f:
+            while True:
+                block = f.read(self.predictions_pipeline_config.response_block_size)
+                if not block:
+                    break
+                yield block
+
+    def load_inference_model(self):
+        if not os.path.exists(self.predictions_pipeline_config.inference_model_path):
+            return None
+        return model_registry.get(self.predictions_pipeline_config.inference_model_path)
 
     def predict(self, features):
         try:
-            logging.info(f"Loading model from {self.predictions_pipeline_config.model_file_path}")
-            model = self.utils.load_object(self.predictions_pipeline_config.model_file_path)
-            logging.info(f"Loading preprocessor from {self.predictions_pipeline_config.preprocessor_path}")
-            preprocessor = self.utils.load_object(self.predictions_pipeline_config.preprocessor_path)
-            transformed_x = preprocessor.transform(features)
-            preds = model.predict(transformed_x)  # Fixed: Added transformed_x
+            inference_model = self.load_inference_model()
+            if inference_model is not None:
+                return self.predict_array(features[inference_model.feature_names].to_numpy())
+            model = model_registry.get(self.predictions_pipeline_config.model_file_path)
+            preprocessor = model_registry.get(self.predictions_pipeline_config.preprocessor_path)
+            with metrics.timer(PREDICTION_STEP_METRIC, step="transform"):
+                transformed_x = preprocessor.transform(features)
+            with metrics.timer(PREDICTION_STEP_METRIC, step="predict"):
+                preds = model.predict(transformed_x)  # Fixed: Added transformed_x
             return preds
         except Exception as e:
             logging.error(f"Error in predict: {str(e)}")
             raise CustomException(e, sys)
 
-    def get_predicted_dataframe(self, input_dataframe_path: str):
+    def model_version(self) -> str:
+        inference_model = self.load_inference_model()
+        if inference_model is not None:
+            return inference_model.version
+        # Unfused artifacts are identified by the registry signatures of the files that were loaded
+        config = self.predictions_pipeline_config
+        model_registry.get(config.model_file_path)
+        model_registry.get(config.preprocessor_path)
+        return f"{model_registry.version(config.model_file_path)}|{model_registry.version(config.preprocessor_path)}"
+
+    def predict_array(self, features: np.ndarray):
+        if drift_monitor.enabled:
+            with metrics.timer(PREDICTION_STEP_METRIC, step="drift"):
+                drift_monitor.observe(features)
+        # Rows already scored by the current model version are served from the prediction cache
+        if not prediction_cache.enabled or len(features) == 0:
+            return self.score_array(features)
+        with metrics.timer(PREDICTION_STEP_METRIC, step="cache"):
+            model_version = self.model_version()
+            keys = prediction_cache.row_keys(features)
+            cached, missing = prediction_cache.get_many(model_version, keys)
+        if not cached:
+            predictions = self.score_array(features)
+            prediction_cache.put_many(model_version, keys, predictions)
+            return predictions
+        predictions = np.empty(len(features), dtype=np.asarray(list(cached.values())).dtype)
+        predictions[list(cached)] = list(cached.values())
+        if missing:
+            missing_predictions = self.score_array(features[missing], shadow=False)
+            prediction_cache.put_many(model_version, [keys[i] for i in missing], missing_predictions)
+            predictions = predictions.astype(np.result_type(predictions, missing_predictions))
+            predictions[missing] = missing_predictions
+        # Challengers still see cached rows. The champion did not score the whole batch, so the batch
+        # counts towards agreement but not towards the latency comparison.
+        challenger_manager.shadow(features, predictions, None, champion=self.load_inference_model())
+        return predictions
+
+    def score_array(self, features: np.ndarray, shadow: bool = True):
+        inference_model = self.load_inference_model()
+        start = time.perf_counter()
+        if inference_model is not None:
+            with metrics.timer(PREDICTION_STEP_METRIC, step="transform"):
+                transformed_x = inference_model.transform(features)
+            with metrics.timer(PREDICTION_STEP_METRIC, step="predict"):
+                predictions = inference_model.model.predict(transformed_x)
+        else:
+            transformed_x = None
+            predictions = self.predict(pd.DataFrame(features, columns=self.schema.sensor_columns))
+        # Challengers score the same batch in the background once the champion has answered
+        if shadow:
+            challenger_manager.shadow(features, predictions, time.perf_counter() - start, champion=inference_model, transformed=transformed_x)
+        return predictions
+
+    @staticmethod
+    def parse_json_features(payload) -> np.ndarray:
+        expected_columns = load_schema().sensor_columns
+        if isinstance(payload, dict):
+            payload = payload.get("instances", payload.get("features"))
+        if isinstance(payload, dict):
+            payload = [payload]
+        if not isinstance(payload, list) or not payload:
+            raise ValueError("Expected a non-empty 'instances' list or a 'features' vector")
+        if not isinstance(payload[0], (list, dict)):
+            payload = [payload]
+        if isinstance(payload[0], dict):
+            payload = [[row.get(column) for column in expected_columns] for row in payload]
+        features = np.array(payload, dtype=load_schema().dtype)
+        if features.ndim != 2 or features.shape[1] != len(expected_columns):
+            raise ValueError(f"Expected rows of {len(expected_columns)} sensor values, got shape {features.shape}")
+        return features
+
+    @staticmethod
+    def parse_binary_features(body: bytes, dtype: str = "float64") -> np.ndarray:
+        schema = load_schema()
+        features = np.frombuffer(body, dtype=np.dtype(dtype).newbyteorder("<"))
+        if features.size == 0 or features.size % schema.n_features != 0:
+            raise ValueError(f"Expected a multiple of {schema.n_features} {dtype} values, got {features.size}")
+        return features.reshape(-1, schema.n_features).astype(schema.dtype)
+
+    def prepare_input_dataframe(self, input_dataframe: pd.DataFrame) -> pd.DataFrame:
+        # Drop unnamed columns if present; sensor columns are matched by name in the schema
+        input_dataframe = input_dataframe.drop(columns=[col for col in input_dataframe.columns if str(col).startswith("Unnamed")], errors='ignore')
+        return input_dataframe
+
+    def validate_upload(self, input_dataframe_path, chunk_size: int) -> set:
+        # First pass over the whole upload: every chunk is validated before any row is scored, so a bad
+        # row late in a large file is rejected without paying for inference on the chunks before it.
+        # pandas also infers dtypes per chunk, so a column can parse as int in one chunk and as float
+        # (because of NaNs) in another; the columns that are float in any chunk are returned and upcast
+        # in every chunk so the output matches a whole-file read exactly.
+        reports = []
+        float_columns = set()
+        rows_read = 0
+        if hasattr(input_dataframe_path, "seek"):
+            input_dataframe_path.seek(0)
         try:
-            prediction_column_name: str = TARGET_COLUMN
-            input_dataframe: pd.DataFrame = pd.read_csv(input_dataframe_path)
-            logging.info(f"Input DataFrame columns: {input_dataframe.columns.tolist()}")
-
-            # Handle unexpected columns
-            expected_columns = [f"Sensor-{i+1}" for i in range(590)]
-            if input_dataframe.columns.tolist()[:590] != expected_columns:
-                logging.warning(f"Unexpected columns: {input_dataframe.columns.tolist()}. Attempting to fix.")
-                if len(input_dataframe.columns) < 590:
-                    raise CustomException(f"Expected at least {len(expected_columns)} columns, got {len(input_dataframe.columns)}", sys)
-                input_dataframe = input_dataframe.iloc[:, :590]
-                input_dataframe.columns = expected_columns
-
-            # Drop unnamed columns if present
-            input_dataframe = input_dataframe.drop(columns=[col for col in input_dataframe.columns if col.startswith("Unnamed")], errors='ignore')
-
-            predictions = self.predict(input_dataframe)
-            input_dataframe[prediction_column_name] = predictions
-            target_column_mapping = {0: 'Bad', 1: 'Good'}
-            input_dataframe[prediction_column_name] = input_dataframe[prediction_column_name].map(target_column_mapping)
-
-            os.makedirs(self.predictions_pipeline_config.prediction_output_dirname, exist_ok=True)
-            input_dataframe.to_csv(self.predictions_pipeline_config.prediction_file_path, index=False)
-            logging.info(f"Predictions saved to {self.predictions_pipeline_config.prediction_file_path}")
-
-            return self.predictions_pipeline_config
+            for input_dataframe in pd.read_csv(input_dataframe_path, chunksize=chunk_size):
+                with metrics.timer(PREDICTION_STEP_METRIC, step="validate"):
+                    _, validation_report = self.schema.validate(input_dataframe, row_offset=rows_read)
+                reports.append(validation_report)
+                float_columns |= set(self.prepare_input_dataframe(input_dataframe).select_dtypes(include=["float"]).columns)
+                rows_read += len(input_dataframe)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            raise SchemaValidationError(f"Upload is not a readable CSV file: {str(e)}")
+        if reports:
+            self.schema.raise_for_report(pd.concat(reports, ignore_index=True))
+        return float_columns
+
+    def score_chunks(self, input_dataframe_path, output_file_path: str, chunk_size: int, float_columns: set) -> None:
+        # Second pass over an upload that validate_upload accepted
+        prediction_column_name: str = TARGET_COLUMN
+        target_column_mapping = {0: 'Bad', 1: 'Good'}
+        if hasattr(input_dataframe_path, "seek"):
+            input_dataframe_path.seek(0)
+        with open(output_file_path, "w", newline="") as output_file:
+            chunks = iter(pd.read_csv(input_dataframe_path, chunksize=chunk_size))
+            for chunk_number in itertools.count():
+                with metrics.timer(PREDICTION_STEP_METRIC, step="read"):
+                    input_dataframe = next(chunks, None)
+                if input_dataframe is None:
+                    break
+                features, _ = self.schema.to_array(input_dataframe)
+                input_dataframe = self.prepare_input_dataframe(input_dataframe)
+                upcast_columns = [col for col in input_dataframe.columns if col in float_columns and input_dataframe[col].dtype.kind != "f"]
+                if upcast_columns:
+                    input_dataframe[upcast_columns] = input_dataframe[upcast_columns].astype("float64")
+
+                predictions = self.predict_array(features)
+                input_dataframe[prediction_column_name] = predictions
+                input_dataframe[prediction_column_name] = input_dataframe[prediction_column_name].map(target_column_mapping)
+                with metrics.timer(PREDICTION_STEP_METRIC, step="write"):
+                    input_dataframe.to_csv(output_file, index=False, header=chunk_number == 0)
+                logging.debug("Scored chunk %d with %d rows", chunk_number, len(input_dataframe))
+
+    def get_predicted_dataframe(self, input_dataframe_path, chunk_size: int = None, output_file_path: str = None):
+        # Raises SchemaValidationError, unwrapped, when the upload does not match the schema
+        output_file_path = output_file_path or self.predictions_pipeline_config.prediction_file_path
+        try:
+            chunk_size = chunk_size or self.predictions_pipeline_config.prediction_chunk_size
+            os.makedirs(os.path.dirname(output_file_path) or ".", exist_ok=True)
+
+            float_columns = self.validate_upload(input_dataframe_path, chunk_size)
+            self.score_chunks(input_dataframe_path, output_file_path, chunk_size, float_columns)
+            logging.info(f"Predictions saved to {output_file_path}")
+
+            return output_file_path
         except Exception as e:
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            if isinstance(e, SchemaValidationError):
+                logging.warning(f"Rejected prediction input: {str(e)}")
+                raise
             logging.error(f"Error in get_predicted_dataframe: {str(e)}")
             raise CustomException(e, sys)
 
     def run_pipeline(self):
+        # Scores the upload straight from the request stream into a request-scoped workspace.
+        # Returns the output path and the workspace, which the caller removes once the response is sent.
+        workspace_dir = self.create_workspace()
         try:
             logging.info("Starting prediction pipeline")
-            input_csv_path = self.save_input_files()
-            self.get_predicted_dataframe(input_csv_path)
-            return self.predictions_pipeline_config
+            upload_stream = self.request.files['file'].stream
+            output_file_path = os.path.join(workspace_dir, self.predictions_pipeline_config.prediction_file_name)
+            self.get_predicted_dataframe(upload_stream, output_file_path=output_file_path)
+            return output_file_path, workspace_dir
         except Exception as e:
+            self.remove_workspace(workspace_dir)
+            if isinstance(e, SchemaValidationError):
+                raise
             logging.error(f"Error in run_pipeline: {str(e)}")
             raise CustomException(e, sys)
\ No newline at end of file
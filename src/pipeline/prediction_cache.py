@@ -0,0 +1,160 @@
+import sys
+import os
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+from dataclasses import dataclass
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.metrics import metrics
+
+
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool = os.getenv("PREDICTION_CACHE_ENABLED", "1") == "1"
+    # Rows kept in the per-process LRU tier
+    max_memory_rows: int = int(os.getenv("PREDICTION_CACHE_MAX_ROWS", "100000"))
+    # Optional sqlite tier shared by all workers on the host; disabled when unset
+    disk_dir: str = os.getenv("PREDICTION_CACHE_DIR")
+    max_disk_rows: int = int(os.getenv("PREDICTION_CACHE_MAX_DISK_ROWS", "1000000"))
+
+
+class PredictionCache:
+    # Predictions keyed by (model version, hash of the row's sensor vector). Entries of any other
+    # model version are dropped as soon as a new version is seen, so retraining invalidates the cache.
+    def __init__(self, config: PredictionCacheConfig = None):
+        self.config = config or PredictionCacheConfig()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._model_version = None
+        self._connection = None
+        self._connection_pid = None
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    @staticmethod
+    def row_keys(features: np.ndarray) -> List[bytes]:
+        # The dtype is part of the key: float32 and float64 inputs are scored on different paths
+        X = np.ascontiguousarray(features)
+        nan_mask = np.isnan(X)
+        if nan_mask.any():
+            # One bit pattern for every NaN so equal rows always hash equally
+            X = np.where(nan_mask, np.nan, X)
+        prefix = X.dtype.str.encode()
+        return [hashlib.blake2b(row, digest_size=16, key=prefix).digest() for row in X]
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(self.config.disk_dir, exist_ok=True)
+            self._connection = sqlite3.connect(os.path.join(self.config.disk_dir, "predictions.sqlite"), timeout=10, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (model_version TEXT, row_hash BLOB, prediction REAL, PRIMARY KEY (model_version, row_hash))"
+            )
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _check_version(self, model_version: str) -> None:
+        if model_version == self._model_version:
+            return
+        logging.info(f"Prediction cache switched to model version {model_version}")
+        self._entries.clear()
+        if self.config.disk_dir:
+            with self._db() as db:
+                db.execute("DELETE FROM predictions WHERE model_version != ?", (model_version,))
+        self._model_version = model_version
+
+    def get_many(self, model_version: str, keys: List[bytes]) -> Tuple[dict, List[int]]:
+        # Returns {position: prediction} for cached rows and the positions that still need scoring
+        try:
+            found = {}
+            with self._lock:
+                self._check_version(model_version)
+                for i, key in enumerate(keys):
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                        found[i] = self._entries[key]
+                missing = [i for i in range(len(keys)) if i not in found]
+                if missing and self.config.disk_dir:
+                    found.update(self._get_from_disk(model_version, keys, missing))
+                    missing = [i for i in missing if i not in found]
+            metrics.inc("wafer_prediction_cache_rows_total", len(found), result="hit")
+            metrics.inc("wafer_prediction_cache_rows_total", len(missing), result="miss")
+            return found, missing
+        except Exception as e:
+            logging.error(f"Error in PredictionCache.get_many: {str(e)}")
+            raise CustomException(e, sys)
+
+    def _get_from_disk(self, model_version: str, keys: List[bytes], positions: List[int]) -> dict:
+        positions_by_key = {}
+        for i in positions:
+            positions_by_key.setdefault(keys[i], []).append(i)
+        found = {}
+        unique_keys = list(positions_by_key)
+        db = self._db()
+        # Stay below sqlite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            rows = db.execute(
+                f"SELECT row_hash, prediction FROM predictions WHERE model_version = ? AND row_hash IN ({','.join('?' * len(batch))})",
+                [model_version, *batch]
+            ).fetchall()
+            for key, prediction in rows:
+                key = bytes(key)
+                self._remember(key, prediction)
+                for i in positions_by_key[key]:
+                    found[i] = prediction
+        return found
+
+    def _remember(self, key: bytes, prediction) -> None:
+        self._entries[key] = prediction
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_memory_rows:
+            self._entries.popitem(last=False)
+
+    def put_many(self, model_version: str, keys: List[bytes], predictions: np.ndarray) -> None:
+        try:
+            values = predictions.tolist()
+            with self._lock:
+                if model_version != self._model_version:
+                    return
+                for key, prediction in zip(keys, values):
+                    self._remember(key, prediction)
+                if self.config.disk_dir:
+                    with self._db() as db:
+                        db.executemany(
+                            "INSERT OR REPLACE INTO predictions (model_version, row_hash, prediction) VALUES (?, ?, ?)",
+                            [(model_version, key, prediction) for key, prediction in zip(keys, values)]
+                        )
+                        # Rowids grow with every insert (a replaced row gets a new one), so keeping only the last
+                        # max_disk_rows rowids bounds the table and drops the oldest inserts first. MAX(rowid) and the
+                        # rowid range delete are index lookups, unlike a COUNT(*) of the whole table on every put.
+                        db.execute(
+                            "DELETE FROM predictions WHERE rowid <= (SELECT MAX(rowid) FROM predictions) - ?",
+                            (self.config.max_disk_rows,)
+                        )
+        except Exception as e:
+            logging.error(f"Error in PredictionCache.put_many: {str(e)}")
+            raise CustomException(e, sys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._model_version = None
+            if self.config.disk_dir:
+                with self._db() as db:
+                    db.execute("DELETE FROM predictions")
+
+
+prediction_cache = PredictionCache()
+metrics.describe("wafer_prediction_cache_rows_total", "Rows looked up in the prediction cache by result")
@@ -1,60 +1,181 @@
 import sys
 import os
-from src.components.data_ingestion import DataIngestion
+import uuid
+import shutil
+import argparse
+from src.constant import *
 from src.exception import CustomException
-from src.components.data_transformation import DataTransformation
-from src.components.model_trainer import ModelTrainer
 from src.logger import logging as lg
+from src.utils.main_utils import MainUtils
+from src.utils.stage_cache import StageCache
+from src.utils.metrics import metrics
+
+STAGE_METRIC = "wafer_pipeline_stage_duration_seconds"
+# Published in this order: once the fused model is in place workers serve it alone, so they never
+# pair a new scaler with the previous model
+SERVED_ARTIFACTS = ["inference_model.pkl", "model.pkl", "scaler.pkl"]
+
+# Stage components (pymongo, sklearn, xgboost) are imported inside each stage so that importing
+# this module, e.g. for --help or from the serving app, stays cheap
 
 class TrainingPipeline:
+    def __init__(self, progress_callback=None, force_rebuild=False, run_id=None):
+        # progress_callback(stage, status) is called as each stage starts and completes
+        self.progress_callback = progress_callback or (lambda stage, status: None)
+        self.stage_cache = StageCache(force_rebuild=force_rebuild)
+        self.stage_keys = {}
+        # Every output of this run, computed or restored from the stage cache, is written here and only
+        # moved over the served artifacts once training has succeeded
+        self.staging_dir = os.path.join(artifact_folder, "staging", run_id or uuid.uuid4().hex)
+        # A challenger run leaves the served artifacts alone
+        self.published_challenger = False
+
+    @staticmethod
+    def stage_outputs(*file_paths):
+        # Maps cache entry names to artifact paths, including artifact store schema sidecars
+        outputs = {}
+        for file_path in file_paths:
+            for path in (file_path, file_path + ".schema.yaml"):
+                if os.path.exists(path):
+                    outputs[os.path.basename(path)] = path
+        return outputs
+
+    @metrics.timed(STAGE_METRIC, stage="ingestion")
     def start_data_ingestion(self):
         try:
             lg.info("Starting data ingestion")
+            self.progress_callback("ingestion", "running")
+            from src.components.data_ingestion import DataIngestion
             data_ingestion = DataIngestion()
             feature_store_file_path = data_ingestion.initiate_data_ingestion()
             lg.info(f"Data ingestion completed. Feature store path: {feature_store_file_path}")
+            self.progress_callback("ingestion", "completed")
             return feature_store_file_path
         except Exception as e:
             lg.error(f"Error in data ingestion: {str(e)}")
             raise CustomException(e, sys)
 
+    @metrics.timed(STAGE_METRIC, stage="transformation")
     def start_data_transformation(self, feature_store_file_path):
         try:
             lg.info(f"Starting data transformation with file: {feature_store_file_path}")
-            datatransformation = DataTransformation(feature_store_file_path=feature_store_file_path)
+            from src.components.data_transformation import DataTransformation
+            datatransformation = DataTransformation(feature_store_file_path=feature_store_file_path, artifact_folder=self.staging_dir)
+            key = self.stage_cache.fingerprint(
+                "transformation",
+                input_paths=[feature_store_file_path, os.path.join("config", "schema.yaml")],
+                # FEATURE_DTYPE can override the schema file, and ARTIFACT_FORMAT decides the file names the
+                # cached outputs are read back from, so both are part of the key
+                values=[datatransformation.dtype.str, datatransformation.artifact_store.artifact_format]
+            )
+            self.stage_keys["transformation"] = key
+
+            manifest = self.stage_cache.lookup("transformation", key)
+            if manifest is not None:
+                output_paths = {
+                    name: os.path.join(datatransformation.artifact_folder, name) for name in manifest["outputs"]
+                }
+                self.stage_cache.restore("transformation", key, output_paths)
+                train_arr = datatransformation.artifact_store.read_array(datatransformation.train_path)
+                test_arr = datatransformation.artifact_store.read_array(datatransformation.test_path)
+                preprocessor_path = datatransformation.preprocessor_path
+                lg.info("Data transformation skipped: inputs unchanged")
+                self.progress_callback("transformation", "cached")
+                return train_arr, test_arr, preprocessor_path
+
+            self.progress_callback("transformation", "running")
             train_arr, test_arr, preprocessor_path = datatransformation.initiate_data_transformation()
+            self.stage_cache.store("transformation", key, self.stage_outputs(
+                datatransformation.train_path, datatransformation.test_path, preprocessor_path
+            ))
             lg.info(f"Data transformation completed. Preprocessor path: {preprocessor_path}")
+            self.progress_callback("transformation", "completed")
             return train_arr, test_arr, preprocessor_path
         except Exception as e:
             lg.error(f"Error in data transformation: {str(e)}")
             raise CustomException(e, sys)
 
-    def start_model_training(self, train_arr, test_arr):
+    @metrics.timed(STAGE_METRIC, stage="training")
+    def start_model_training(self, train_arr, test_arr, preprocessor_path=None):
         try:
             lg.info("Starting model training")
-            model_trainer = ModelTrainer()
-            model_score = model_trainer.initiate_model_trainer(train_arr, test_arr)
+            from src.components.model_trainer import ModelTrainer
+            model_trainer = ModelTrainer(progress_callback=self.progress_callback, output_dir=self.staging_dir)
+            trainer_config = model_trainer.model_trainer_config
+            # Transformation outputs are fully determined by its key, so it stands in for the arrays
+            input_key = self.stage_keys.get("transformation") or self.stage_cache.fingerprint(
+                "training-input", values=[MainUtils.fingerprint_array(train_arr), MainUtils.fingerprint_array(test_arr)]
+            )
+            key = self.stage_cache.fingerprint(
+                "training",
+                input_paths=[trainer_config.model_config_file_path],
+                values=[input_key, preprocessor_path is not None]
+            )
+
+            # A published challenger is a new versioned file rather than a restorable output, so it is never cached
+            publish_challenger = model_trainer.publishes_challenger(preprocessor_path)
+            manifest = None if publish_challenger else self.stage_cache.lookup("training", key)
+            if manifest is not None:
+                output_paths = {
+                    name: os.path.join(model_trainer.output_dir, name) for name in manifest["outputs"]
+                }
+                self.stage_cache.restore("training", key, output_paths)
+                model_score = manifest["values"]["model_score"]
+                lg.info(f"Model training skipped: inputs unchanged. Score: {model_score}")
+                self.progress_callback("evaluation", "cached")
+                self.progress_callback("tuning", "cached")
+                return model_score
+
+            model_score = model_trainer.initiate_model_trainer(train_arr, test_arr, preprocessor_path=preprocessor_path)
+            if publish_challenger:
+                self.published_challenger = True
+                lg.info(f"Model training completed; published as challenger. Score: {model_score}")
+                return model_score
+            output_files = [model_trainer.trained_model_path]
+            if preprocessor_path is not None:
+                output_files.append(model_trainer.inference_model_path)
+            self.stage_cache.store("training", key, self.stage_outputs(*output_files), values={"model_score": float(model_score)})
             lg.info(f"Model training completed. Score: {model_score}")
             return model_score
         except Exception as e:
             lg.error(f"Error in model training: {str(e)}")
             raise CustomException(e, sys)
 
+    def publish_artifacts(self) -> list:
+        # Renames are atomic within the artifacts folder, so serving workers see each file either old or new
+        published = []
+        for file_name in SERVED_ARTIFACTS:
+            staged_path = os.path.join(self.staging_dir, file_name)
+            if os.path.exists(staged_path):
+                os.replace(staged_path, os.path.join(artifact_folder, file_name))
+                published.append(file_name)
+        lg.info(f"Published {published} from {self.staging_dir}")
+        return published
+
+    @metrics.timed(STAGE_METRIC, stage="total")
     def run_pipeline(self):
         try:
-            lg.info("Running training pipeline")
+            lg.info(f"Running training pipeline in {self.staging_dir}")
             feature_store_file_path = self.start_data_ingestion()
             train_arr, test_arr, preprocessor_path = self.start_data_transformation(feature_store_file_path)
-            r2square = self.start_model_training(train_arr, test_arr)
+            r2square = self.start_model_training(train_arr, test_arr, preprocessor_path)
+            if not self.published_challenger:
+                self.publish_artifacts()
             lg.info(f"Training completed. Trained model score: {r2square}")
             return r2square
         except Exception as e:
             lg.error(f"Error in pipeline: {str(e)}")
             raise CustomException(e, sys)
+        finally:
+            # Staged outputs of a failed run are discarded; the served artifacts were never touched
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     try:
-        pipeline = TrainingPipeline()
+        parser = argparse.ArgumentParser(description="Run the wafer fault training pipeline")
+        parser.add_argument("--force-rebuild", action="store_true", help="ignore the stage cache and re-run every stage")
+        args = parser.parse_args()
+        pipeline = TrainingPipeline(force_rebuild=args.force_rebuild)
         pipeline.run_pipeline()
     except Exception as e:
         lg.error(f"Error in main: {str(e)}")
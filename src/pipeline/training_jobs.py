@@ -0,0 +1,202 @@
+import sys
+import os
+import re
+import glob
+import uuid
+import threading
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from dataclasses import dataclass, field, asdict, fields
+from src.constant import *
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.main_utils import MainUtils
+from src.utils.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are not serialised across processes
+    fcntl = None
+
+
+TRAINING_STAGES = ["ingestion", "transformation", "evaluation", "tuning"]
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class TrainingInProgressError(RuntimeError):
+    # Raised by a non-blocking training_lock while a training runner holds the lock
+    pass
+
+
+@dataclass
+class TrainingJobConfig:
+    lock_file_path: str = os.path.join(artifact_folder, ".training.lock")
+    # One file per job, so every serving worker sees the same jobs
+    jobs_dir: str = os.path.join(artifact_folder, "training_jobs")
+    max_job_history: int = 50
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    status: str = "queued"
+    current_stage: str = None
+    stages: dict = field(default_factory=lambda: {stage: {"status": "pending"} for stage in TRAINING_STAGES})
+    # Microseconds keep jobs submitted within the same second in submission order
+    submitted_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="microseconds"))
+    started_at: str = None
+    finished_at: str = None
+    model_score: float = None
+    error: str = None
+    runner_pid: int = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "TrainingJob":
+        names = {job_field.name for job_field in fields(cls)}
+        return cls(**{key: value for key, value in content.items() if key in names})
+
+
+class TrainingJobManager:
+    # Serving workers only record jobs and start a runner; training runs in that separate process
+    # (python -m src.pipeline.training_jobs), so recycling a worker, e.g. on the SIGHUP that follows
+    # a model publish, never interrupts a run or loses its status. Job state lives in jobs_dir and
+    # is only written by the submitting worker (once, when queued) and then by the runner.
+    def __init__(self, config: TrainingJobConfig = None):
+        self.config = config or TrainingJobConfig()
+        self.utils = MainUtils()
+
+    def job_path(self, job_id: str) -> str:
+        return os.path.join(self.config.jobs_dir, f"{job_id}.yaml")
+
+    def save(self, job: TrainingJob) -> None:
+        self.utils.write_yaml_file(self.job_path(job.job_id), job.to_dict())
+
+    def submit(self) -> TrainingJob:
+        try:
+            job = TrainingJob(job_id=uuid.uuid4().hex)
+            self.save(job)
+            self.start_runner()
+            logging.info(f"Queued training job {job.job_id}")
+            return job
+        except Exception as e:
+            logging.error(f"Error in TrainingJobManager.submit: {str(e)}")
+            raise CustomException(e, sys)
+
+    def start_runner(self) -> None:
+        # A runner that finds another one holding the lock waits for it and then exits once the queue is
+        # empty, so starting one per submission never runs a job twice and never leaves a job behind.
+        # Its own session keeps it out of signals sent to the worker's process group.
+        runner = subprocess.Popen(
+            [sys.executable, "-m", "src.pipeline.training_jobs"],
+            cwd=os.getcwd(),
+            stdin=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        threading.Thread(target=runner.wait, name="training-runner-reaper", daemon=True).start()
+
+    def get(self, job_id: str) -> TrainingJob:
+        if not JOB_ID_PATTERN.fullmatch(job_id) or not os.path.exists(self.job_path(job_id)):
+            return None
+        return TrainingJob.from_dict(self.utils.read_yaml_file(self.job_path(job_id)))
+
+    def list(self) -> list:
+        jobs = []
+        for job_path in glob.glob(os.path.join(self.config.jobs_dir, "*.yaml")):
+            try:
+                jobs.append(TrainingJob.from_dict(self.utils.read_yaml_file(job_path)))
+            except Exception:
+                # Removed by history pruning between the listing and the read
+                continue
+        return sorted(jobs, key=lambda job: job.submitted_at)
+
+    def prune_history(self) -> None:
+        finished_jobs = [job for job in self.list() if job.status not in ("queued", "running")]
+        for job in finished_jobs[:max(0, len(finished_jobs) - self.config.max_job_history)]:
+            os.remove(self.job_path(job.job_id))
+
+    def _update_progress(self, job: TrainingJob, stage: str, status: str) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        stage_progress = job.stages.setdefault(stage, {})
+        stage_progress["status"] = status
+        stage_progress["started_at" if status == "running" else "finished_at"] = now
+        if status == "running":
+            job.current_stage = stage
+        self.save(job)
+        logging.info(f"Training job {job.job_id}: {stage} {status}")
+
+    @contextmanager
+    def training_lock(self, blocking: bool = True):
+        # Held by the training runner for its whole run and by champion promotions, since both replace
+        # the served artifacts; non-blocking callers get TrainingInProgressError instead of waiting
+        os.makedirs(os.path.dirname(self.config.lock_file_path), exist_ok=True)
+        with open(self.config.lock_file_path, "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise TrainingInProgressError("A training run is in progress; retry once it has finished")
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def run_queued(self) -> None:
+        # Runner entry point: holds the training lock and runs queued jobs in submission order until none are left
+        with self.training_lock():
+            try:
+                for job in self.list():
+                    if job.status == "running":
+                        # Only the lock holder runs jobs, so a job still marked running lost its runner
+                        self._finish(job, "failed", error=f"Training runner {job.runner_pid} exited before the job finished")
+                while True:
+                    queued_jobs = [job for job in self.list() if job.status == "queued"]
+                    if not queued_jobs:
+                        break
+                    self._run(queued_jobs[0])
+                    self.prune_history()
+            finally:
+                metrics.flush()
+
+    def _finish(self, job: TrainingJob, status: str, model_score: float = None, error: str = None) -> None:
+        job.status = status
+        job.model_score = model_score
+        job.error = error
+        if status == "failed" and job.current_stage is not None:
+            job.stages[job.current_stage]["status"] = "failed"
+        job.finished_at = datetime.now().isoformat(timespec="seconds")
+        self.save(job)
+
+    def _run(self, job: TrainingJob) -> None:
+        # Imported here so serving workers never load the training stack
+        from src.pipeline.train_pipeline import TrainingPipeline
+
+        job.status = "running"
+        job.started_at = datetime.now().isoformat(timespec="seconds")
+        job.runner_pid = os.getpid()
+        self.save(job)
+        try:
+            train_pipeline = TrainingPipeline(
+                progress_callback=lambda stage, status: self._update_progress(job, stage, status),
+                run_id=job.job_id
+            )
+            model_score = train_pipeline.run_pipeline()
+            self._finish(job, "succeeded", model_score=float(model_score))
+        except Exception as e:
+            logging.error(f"Training job {job.job_id} failed: {str(e)}")
+            self._finish(job, "failed", error=str(e))
+
+
+training_job_manager = TrainingJobManager()
+
+
+if __name__ == "__main__":
+    try:
+        training_job_manager.run_queued()
+    except Exception as e:
+        logging.error(f"Error in training runner: {str(e)}")
+        raise CustomException(e, sys)
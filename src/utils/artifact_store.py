@@ -0,0 +1,236 @@
+import sys
+import os
+import glob
+from typing import List
+import numpy as np
+import pandas as pd
+import yaml
+from src.constant import *
+from src.exception import CustomException
+from src.logger import logging
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+class ArtifactStore:
+    extensions = {"npy": ".npy", "parquet": ".parquet", "csv": ".csv"}
+
+    def __init__(self, artifact_format: str = None, dtype: str = "float64") -> None:
+        self.artifact_format = artifact_format or ARTIFACT_FORMAT
+        if self.artifact_format not in self.extensions:
+            raise CustomException(f"Unknown artifact format '{self.artifact_format}'. Expected one of {list(self.extensions)}", sys)
+        if self.artifact_format == "parquet" and not PARQUET_AVAILABLE:
+            raise CustomException("The parquet artifact format requires pyarrow to be installed", sys)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def extension(self) -> str:
+        return self.extensions[self.artifact_format]
+
+    def path_for(self, base_path: str) -> str:
+        return base_path + self.extension
+
+    @staticmethod
+    def schema_path(file_path: str) -> str:
+        return file_path + ".schema.yaml"
+
+    @staticmethod
+    def row_ids_path(file_path: str) -> str:
+        return file_path + ".ids"
+
+    @classmethod
+    def sidecar_paths(cls, file_path: str) -> List[str]:
+        return [cls.schema_path(file_path), cls.row_ids_path(file_path)]
+
+    @classmethod
+    def format_of(cls, file_path: str) -> str:
+        for artifact_format, extension in cls.extensions.items():
+            if file_path.endswith(extension):
+                return artifact_format
+        raise CustomException(f"Cannot infer artifact format of {file_path}", sys)
+
+    @classmethod
+    def list_partitions(cls, directory: str, prefix: str = "part-") -> List[str]:
+        partitions = []
+        for extension in cls.extensions.values():
+            partitions.extend(glob.glob(os.path.join(directory, f"{prefix}*{extension}")))
+        return sorted(partitions)
+
+    def write_frame(self, df: pd.DataFrame, base_path: str) -> str:
+        try:
+            file_path = self.path_for(base_path)
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            temp_path = file_path + ".tmp"
+            columns = [str(column) for column in df.columns]
+            if self.artifact_format == "npy":
+                array = np.ascontiguousarray(df.to_numpy(dtype=self.dtype))
+                self.write_array(array, columns, file_path)
+                return file_path
+            if self.artifact_format == "parquet":
+                df.astype(self.dtype).to_parquet(temp_path, index=False)
+            else:
+                df.to_csv(temp_path, index=False)
+            os.replace(temp_path, file_path)
+            logging.info(f"Wrote {df.shape} frame to {file_path}")
+            return file_path
+        except Exception as e:
+            logging.error(f"Error in write_frame: {str(e)}")
+            raise CustomException(e, sys)
+
+    def write_row_ids(self, file_path: str, row_ids: List[str]) -> None:
+        # Identity of each row (the wafer id), so readers keep only the latest version of a row across partitions
+        temp_path = self.row_ids_path(file_path) + ".tmp"
+        with open(temp_path, "wb") as ids_file:
+            np.save(ids_file, np.asarray(row_ids, dtype=str))
+        os.replace(temp_path, self.row_ids_path(file_path))
+
+    @classmethod
+    def latest_row_masks(cls, partitions: List[str]) -> List[np.ndarray]:
+        # Per partition, a mask of the rows that no later partition supersedes with the same row id, or
+        # None when every row is kept. Partitions without row ids are always kept whole.
+        row_ids = [np.load(cls.row_ids_path(partition)) if os.path.exists(cls.row_ids_path(partition)) else None for partition in partitions]
+        if all(ids is None for ids in row_ids):
+            return [None] * len(partitions)
+        all_ids = np.concatenate([ids for ids in row_ids if ids is not None])
+        # First occurrence in the reversed ids is the last occurrence overall
+        _, last_reversed = np.unique(all_ids[::-1], return_index=True)
+        keep = np.zeros(len(all_ids), dtype=bool)
+        keep[len(all_ids) - 1 - last_reversed] = True
+        masks, start = [], 0
+        for ids in row_ids:
+            if ids is None:
+                masks.append(None)
+                continue
+            mask = keep[start:start + len(ids)]
+            start += len(ids)
+            masks.append(None if mask.all() else mask)
+        return masks
+
+    def write_schema(self, file_path: str, columns: List[str], dtype: np.dtype, shape: tuple) -> None:
+        with open(self.schema_path(file_path), "w") as schema_file:
+            yaml.safe_dump({"columns": list(columns), "dtype": np.dtype(dtype).str, "shape": list(shape)}, schema_file)
+
+    def write_array(self, array: np.ndarray, columns: List[str], file_path: str) -> str:
+        try:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            temp_path = file_path + ".tmp"
+            self.write_schema(file_path, columns, array.dtype, array.shape)
+            with open(temp_path, "wb") as array_file:
+                np.save(array_file, array)
+            os.replace(temp_path, file_path)
+            logging.info(f"Wrote {array.shape} {array.dtype} array to {file_path}")
+            return file_path
+        except Exception as e:
+            logging.error(f"Error in write_array: {str(e)}")
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def cast_frame(df: pd.DataFrame, dtype) -> pd.DataFrame:
+        # dtype is a single dtype or a {column: dtype} map; map entries for absent columns are ignored
+        if dtype is None:
+            return df
+        if isinstance(dtype, dict):
+            dtype = {column: column_dtype for column, column_dtype in dtype.items() if column in df.columns and df[column].dtype != column_dtype}
+            return df.astype(dtype, copy=False) if dtype else df
+        return df.astype(dtype, copy=False)
+
+    def read_columns(self, file_path: str) -> List[str]:
+        artifact_format = self.format_of(file_path)
+        if artifact_format == "npy":
+            with open(self.schema_path(file_path)) as schema_file:
+                return yaml.safe_load(schema_file)["columns"]
+        if artifact_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_schema(file_path).names
+        return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+    def read_array(self, file_path: str, columns: List[str] = None, mmap: bool = True) -> np.ndarray:
+        # npy artifacts are memory-mapped; projecting columns copies only the selected ones
+        try:
+            if self.format_of(file_path) != "npy":
+                return self.read_frame(file_path, columns=columns).to_numpy()
+            array = np.load(file_path, mmap_mode="r" if mmap else None)
+            if columns is not None:
+                column_index = {column: i for i, column in enumerate(self.read_columns(file_path))}
+                array = array[:, [column_index[column] for column in columns]]
+            return array
+        except Exception as e:
+            logging.error(f"Error in read_array: {str(e)}")
+            raise CustomException(e, sys)
+
+    def read_frame(self, file_path: str, columns: List[str] = None, mmap: bool = True, dtype=None) -> pd.DataFrame:
+        try:
+            artifact_format = self.format_of(file_path)
+            if artifact_format == "npy":
+                columns = columns or self.read_columns(file_path)
+                return self.cast_frame(pd.DataFrame(self.read_array(file_path, columns=columns, mmap=mmap), columns=columns, copy=False), dtype)
+            if artifact_format == "parquet":
+                return self.cast_frame(pd.read_parquet(file_path, columns=columns), dtype)
+            return pd.read_csv(file_path, usecols=columns, dtype=dtype)
+        except Exception as e:
+            logging.error(f"Error in read_frame: {str(e)}")
+            raise CustomException(e, sys)
+
+    def read_partitions(self, directory: str, columns: List[str] = None, dtype=None) -> pd.DataFrame:
+        partitions = self.list_partitions(directory)
+        if not partitions:
+            raise CustomException(f"No partitions found in {directory}", sys)
+        frames = []
+        for partition, mask in zip(partitions, self.latest_row_masks(partitions)):
+            frame = self.read_frame(partition, columns=columns, mmap=False, dtype=dtype)
+            frames.append(frame if mask is None else frame[mask])
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_frames(self, path: str, chunk_size: int, columns: List[str] = None, dtype=None):
+        # Yields bounded row chunks from a single artifact or a partitioned directory; rows superseded
+        # by a later partition are skipped, so a chunk can be shorter than chunk_size
+        try:
+            file_paths = self.list_partitions(path) if os.path.isdir(path) else [path]
+            masks = self.latest_row_masks(file_paths) if os.path.isdir(path) else [None]
+            for file_path, mask in zip(file_paths, masks):
+                for start, chunk in self.iter_file_chunks(file_path, chunk_size, columns, dtype):
+                    if mask is not None:
+                        chunk = chunk[mask[start:start + len(chunk)]]
+                    if len(chunk):
+                        yield chunk
+        except Exception as e:
+            logging.error(f"Error in iter_frames: {str(e)}")
+            raise CustomException(e, sys)
+
+    def iter_file_chunks(self, file_path: str, chunk_size: int, columns: List[str] = None, dtype=None):
+        # Yields (first row number, frame) for consecutive chunks of one artifact
+        artifact_format = self.format_of(file_path)
+        if artifact_format == "npy":
+            file_columns = self.read_columns(file_path)
+            array = np.load(file_path, mmap_mode="r")
+            # Only the requested columns of each chunk are read from the map
+            if columns is not None and list(columns) != file_columns:
+                column_index = {column: i for i, column in enumerate(file_columns)}
+                positions = [column_index[column] for column in columns]
+            else:
+                columns, positions = file_columns, slice(None)
+            for start in range(0, len(array), chunk_size):
+                yield start, self.cast_frame(pd.DataFrame(np.array(array[start:start + chunk_size, positions]), columns=columns), dtype)
+            return
+        start = 0
+        if artifact_format == "parquet":
+            import pyarrow.parquet as pq
+            chunks = (self.cast_frame(batch.to_pandas(), dtype) for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=columns))
+        else:
+            chunks = pd.read_csv(file_path, chunksize=chunk_size, usecols=columns, dtype=dtype)
+        for chunk in chunks:
+            yield start, chunk
+            start += len(chunk)
+
+    def export_csv(self, file_path: str, csv_path: str) -> str:
+        try:
+            self.read_frame(file_path).to_csv(csv_path, index=False)
+            logging.info(f"Exported {file_path} to {csv_path}")
+            return csv_path
+        except Exception as e:
+            logging.error(f"Error in export_csv: {str(e)}")
+            raise CustomException(e, sys)
@@ -0,0 +1,80 @@
+import os
+from dataclasses import dataclass
+from statistics import NormalDist
+import numpy as np
+
+COUNT_BLOCK_ROWS = np.iinfo(np.uint16).max
+# Training rows used for the baseline. Deciles of a few thousand evenly spaced rows are as good as the full
+# data for the PSI, and the sample (with its standardised and sorted copies) stays a few tens of MB at 590 sensors.
+BASELINE_MAX_ROWS = int(os.getenv("DRIFT_BASELINE_MAX_ROWS", "5000"))
+
+
+@dataclass
+class DriftBaseline:
+    # Per-sensor histogram of the training data in standardised units, fitted with the preprocessor and
+    # saved on it as drift_baseline_. Edges are training quantiles, so shares are close to 1 / n_bins for
+    # continuous sensors and follow the real shape (ties, point masses) of discrete ones.
+    edges: np.ndarray
+    shares: np.ndarray
+    # Non-missing training values per sensor; sensors without any have no distribution to compare against
+    observed: np.ndarray
+
+    @property
+    def n_bins(self) -> int:
+        return self.edges.shape[1] + 1
+
+
+def count_above(Z: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    # Per sensor, the number of values above each of its bin edges; NaN compares False and is never counted.
+    # Summing the comparison bytes into uint16 is several times faster than into int64, so rows are
+    # taken in blocks small enough that the uint16 counts cannot overflow.
+    # Each edge is compared as one contiguous row of per-sensor values, which is much faster than a strided column.
+    above = np.zeros(edges.shape, dtype=np.int64)
+    edges_by_bin = np.ascontiguousarray(edges.T, dtype=Z.dtype)
+    for start in range(0, len(Z), COUNT_BLOCK_ROWS):
+        block = Z[start:start + COUNT_BLOCK_ROWS]
+        for k, edge in enumerate(edges_by_bin):
+            above[:, k] += (block > edge).view(np.uint8).sum(axis=0, dtype=np.uint16)
+    return above
+
+
+def bin_counts(Z: np.ndarray, edges: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    above = count_above(Z, edges)
+    bins = np.empty((Z.shape[1], edges.shape[1] + 1), dtype=np.int64)
+    bins[:, 0] = observed - above[:, 0]
+    bins[:, 1:-1] = above[:, :-1] - above[:, 1:]
+    bins[:, -1] = above[:, -1]
+    return bins
+
+
+def normal_baseline(n_features: int, n_bins: int) -> DriftBaseline:
+    # Fallback for preprocessors fitted before baselines were saved: equal-probability bins of a normal distribution
+    edges = np.array([NormalDist().inv_cdf(q) for q in np.arange(1, n_bins) / n_bins], dtype=np.float32)
+    return DriftBaseline(
+        edges=np.tile(edges, (n_features, 1)),
+        shares=np.full((n_features, n_bins), 1.0 / n_bins),
+        observed=np.ones(n_features, dtype=np.int64),
+    )
+
+
+def baseline_stride(n_rows: int) -> int:
+    return max(1, -(-n_rows // BASELINE_MAX_ROWS))
+
+
+def fit_drift_baseline(X: np.ndarray, mean: np.ndarray, scale: np.ndarray, n_bins: int = None) -> DriftBaseline:
+    # X holds raw training values of the sensors the scaler was fitted on, NaN for missing readings
+    n_bins = n_bins or int(os.getenv("DRIFT_BINS", "10"))
+    X = X[::baseline_stride(len(X))]
+    Z = ((np.asarray(X, dtype=np.float64) - mean) / scale).astype(np.float32)
+    nan_mask = np.isnan(Z)
+    observed = len(Z) - np.count_nonzero(nan_mask, axis=0)
+    # A column sort puts NaN last, so the quantiles of each sensor index into its first `observed` values
+    ordered = np.sort(Z, axis=0)
+    quantiles = np.arange(1, n_bins) / n_bins
+    positions = np.floor(quantiles[:, None] * np.maximum(observed - 1, 0)).astype(np.int64)
+    edges = np.take_along_axis(ordered, positions, axis=0).T
+    edges[observed == 0] = 0.0
+    bins = bin_counts(Z, edges, observed)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = np.where(observed[:, None] > 0, bins / observed[:, None], 0.0)
+    return DriftBaseline(edges=np.ascontiguousarray(edges), shares=shares, observed=observed.astype(np.int64))
@@ -0,0 +1,100 @@
+import warnings
+from typing import List
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class FeatureSelector(BaseEstimator, TransformerMixin):
+    # First step of the preprocessor: drops mostly-missing, constant and near-duplicate sensors
+    # (and optionally unimportant ones) so every later step and the model see a narrower matrix.
+    # Correlations are computed on mean-imputed values, matching what the imputer feeds the model.
+    def __init__(self, max_nan_ratio: float = 0.7, min_variance: float = 0.0, max_correlation: float = 0.98,
+                 min_importance: float = None, random_state: int = 42):
+        self.max_nan_ratio = max_nan_ratio
+        self.min_variance = min_variance
+        self.max_correlation = max_correlation
+        self.min_importance = min_importance
+        self.random_state = random_state
+
+    def filter_columns(self, nan_ratio: np.ndarray, variance: np.ndarray) -> np.ndarray:
+        # All-NaN columns have a NaN variance and are dropped with the constant ones
+        with np.errstate(invalid="ignore"):
+            return (nan_ratio <= self.max_nan_ratio) & (np.nan_to_num(variance, nan=0.0) > self.min_variance)
+
+    def drop_correlated(self, keep: np.ndarray, cross_products: np.ndarray) -> np.ndarray:
+        # cross_products is X_c.T @ X_c of the mean-centered, imputed columns selected by keep;
+        # of every pair above the threshold the later column is dropped
+        keep = keep.copy()
+        if self.max_correlation is None or self.max_correlation >= 1:
+            return keep
+        norms = np.sqrt(np.diag(cross_products))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlated = np.abs(cross_products / np.outer(norms, norms)) > self.max_correlation
+        correlated = np.triu(correlated, k=1)
+        dropped = np.zeros(len(correlated), dtype=bool)
+        for i in range(len(correlated)):
+            if not dropped[i]:
+                dropped |= correlated[i]
+        keep[np.flatnonzero(keep)[dropped]] = False
+        return keep
+
+    def prune_by_importance(self, values: np.ndarray, y, keep: np.ndarray) -> np.ndarray:
+        from sklearn.ensemble import ExtraTreesClassifier
+        X = values[:, keep]
+        X = np.where(np.isnan(X), np.nanmean(X, axis=0), X)
+        forest = ExtraTreesClassifier(n_estimators=200, random_state=self.random_state, n_jobs=-1).fit(X, y)
+        important = forest.feature_importances_ >= self.min_importance
+        if not important.any():
+            return keep
+        keep = keep.copy()
+        keep[np.flatnonzero(keep)[~important]] = False
+        return keep
+
+    def set_selection(self, keep: np.ndarray, feature_names: List[str] = None) -> "FeatureSelector":
+        if not keep.any():
+            raise ValueError("Feature selection dropped every column; relax the feature_selection thresholds")
+        self.n_features_in_ = len(keep)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.support_ = keep
+        self.selected_indices_ = np.flatnonzero(keep)
+        return self
+
+    def fit(self, X, y=None) -> "FeatureSelector":
+        feature_names = list(X.columns) if hasattr(X, "columns") else None
+        values = np.asarray(X, dtype=np.float64)
+        missing = np.isnan(values)
+        with warnings.catch_warnings():
+            # All-NaN columns warn about empty slices; they are dropped by filter_columns
+            warnings.simplefilter("ignore", RuntimeWarning)
+            variance = np.nanvar(values, axis=0)
+            means = np.nanmean(values, axis=0)
+        keep = self.filter_columns(missing.mean(axis=0), variance)
+
+        centered = values[:, keep] - means[keep]
+        centered[missing[:, keep]] = 0.0
+        keep = self.drop_correlated(keep, centered.T @ centered)
+
+        if self.min_importance and y is not None:
+            keep = self.prune_by_importance(values, np.asarray(y), keep)
+        return self.set_selection(keep, feature_names)
+
+    def get_support(self, indices: bool = False) -> np.ndarray:
+        return self.selected_indices_ if indices else self.support_
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        names = input_features if input_features is not None else getattr(self, "feature_names_in_", None)
+        if names is None:
+            names = [f"x{i}" for i in range(self.n_features_in_)]
+        return np.asarray(names, dtype=object)[self.selected_indices_]
+
+    def transform(self, X):
+        # Frames stay frames (selected by name when fitted on names) so later steps keep feature names
+        if hasattr(X, "columns"):
+            if hasattr(self, "feature_names_in_"):
+                return X[list(self.feature_names_in_[self.selected_indices_])]
+            return X.iloc[:, self.selected_indices_]
+        X = np.asarray(X)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        return X[:, self.selected_indices_]
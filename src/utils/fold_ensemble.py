@@ -0,0 +1,38 @@
+from typing import Dict, List
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+
+def positive_scores(model: object, X: np.ndarray) -> np.ndarray:
+    # Score of the second class in [0, 1]; margin classifiers without predict_proba (SVC) are squashed
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(X)[:, 1]
+    return 1.0 / (1.0 + np.exp(-model.decision_function(X)))
+
+
+class FoldEnsemble(BaseEstimator, ClassifierMixin):
+    # Ensemble built from the fold models fitted during cross-validated model evaluation, so nothing is refitted.
+    # Each member averages the scores of its fold models; "voting" averages the members, "stacking" feeds
+    # the member scores to a meta model fitted on the out-of-fold scores.
+    def __init__(self, members: Dict[str, List[object]], method: str = "voting", meta_model: object = None):
+        self.members = members
+        self.method = method
+        self.meta_model = meta_model
+        first_model = next(iter(members.values()))[0]
+        self.classes_ = np.asarray(first_model.classes_)
+
+    def member_scores(self, X: np.ndarray) -> np.ndarray:
+        return np.column_stack([
+            np.mean([positive_scores(model, X) for model in fold_models], axis=0)
+            for fold_models in self.members.values()
+        ])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        scores = self.member_scores(X)
+        if self.method == "stacking":
+            return self.meta_model.predict_proba(scores)
+        positive = scores.mean(axis=1)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
@@ -0,0 +1,68 @@
+import hashlib
+import pickle
+from datetime import datetime
+from typing import List
+import numpy as np
+
+
+class InferenceModel:
+    # Single serving artifact: feature selection, imputation, scaling and the estimator applied on a plain ndarray.
+    # The fitted sklearn statistics are copied out so scoring needs no pandas and no Pipeline dispatch.
+    def __init__(self, preprocessor: object, model: object, feature_names: List[str], model_name: str = None) -> None:
+        steps = dict(preprocessor.steps) if hasattr(preprocessor, "steps") else {"scaler": preprocessor}
+        imputer = steps.get("imputer")
+        scaler = steps["scaler"]
+        selector = steps.get("selector")
+
+        self.feature_names = list(feature_names)
+        # Positions of the input columns the model was trained on; None means all of them
+        self.selected_indices = None if selector is None else np.asarray(selector.selected_indices_)
+        self.fill_values = None if imputer is None else np.asarray(imputer.statistics_, dtype=np.float64)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.model = model
+        # Kept so a promotion can write the matching unfused model.pkl/scaler.pkl pair
+        self.preprocessor = preprocessor
+        # Training histogram per sensor for the drift monitor; None for preprocessors fitted without one
+        self.drift_baseline = getattr(preprocessor, "drift_baseline_", None)
+        self.model_name = model_name or type(model).__name__
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        digest = hashlib.sha256(pickle.dumps((self.selected_indices, self.fill_values, self.mean, self.scale, model))).hexdigest()
+        self.version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{digest[:12]}"
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    @property
+    def selected_feature_names(self) -> List[str]:
+        selected_indices = getattr(self, "selected_indices", None)
+        if selected_indices is None:
+            return self.feature_names
+        return [self.feature_names[i] for i in selected_indices]
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        # Works in the caller's float precision; float32 input stays float32
+        features = np.asarray(features)
+        dtype = np.float32 if features.dtype == np.float32 else np.float64
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"Expected an array of shape (n, {self.n_features}), got {features.shape}")
+        # Artifacts saved before feature selection existed have no selected_indices
+        selected_indices = getattr(self, "selected_indices", None)
+        if selected_indices is not None:
+            # Only the selected columns are copied; the rest of the input is never touched
+            X = np.ascontiguousarray(features[:, selected_indices], dtype=dtype)
+        else:
+            X = np.array(features, dtype=dtype, order="C", copy=True)
+        if self.fill_values is not None:
+            rows, cols = np.nonzero(np.isnan(X))
+            X[rows, cols] = self.fill_values[cols]
+        X -= self.mean.astype(dtype, copy=False)
+        X /= self.scale.astype(dtype, copy=False)
+        return X
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self.model.predict(self.transform(features))
+
+    def predict_frame(self, input_dataframe) -> np.ndarray:
+        return self.predict(input_dataframe[self.feature_names].to_numpy())
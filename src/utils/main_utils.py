@@ -1,6 +1,8 @@
 import sys
 from typing import Dict, Tuple
 import os
+import hashlib
+import numpy as np
 import pandas as pd
 import pickle
 import yaml
@@ -20,6 +22,19 @@ class MainUtils:
             logging.error(f"Error in read_yaml_file: {str(e)}")
             raise CustomException(e, sys)
 
+    @staticmethod
+    def write_yaml_file(file_path: str, content: dict) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            # Write to a temp file and rename so a crash never leaves a truncated file behind
+            temp_file_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(temp_file_path, "w") as yaml_file:
+                yaml.safe_dump(content, yaml_file)
+            os.replace(temp_file_path, file_path)
+        except Exception as e:
+            logging.error(f"Error in write_yaml_file: {str(e)}")
+            raise CustomException(e, sys)
+
     def read_schema_config_file(self) -> dict:
         try:
             schema_config = self.read_yaml_file(os.path.join("config", "schema.yaml"))
@@ -28,13 +43,23 @@ class MainUtils:
             logging.error(f"Error in read_schema_config_file: {str(e)}")
             raise CustomException(e, sys)
 
+    @staticmethod
+    def fingerprint_array(array: np.ndarray) -> str:
+        array = np.ascontiguousarray(array)
+        sha = hashlib.sha256(str((array.shape, array.dtype.str)).encode())
+        sha.update(array.tobytes())
+        return sha.hexdigest()
+
     @staticmethod
     def save_object(file_path: str, obj: object) -> None:
         logging.info(f"Entered the save_object method of MainUtils class with path: {file_path}")
         try:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "wb") as file_obj:
+            # Write to a temp file and rename so readers never see a half-written pickle
+            temp_file_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(temp_file_path, "wb") as file_obj:
                 pickle.dump(obj, file_obj)
+            os.replace(temp_file_path, file_path)
             logging.info(f"Object saved to {file_path}")
         except Exception as e:
             logging.error(f"Error in save_object: {str(e)}")
@@ -0,0 +1,256 @@
+import os
+import json
+import glob
+import time
+import atexit
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited processes are folded in without a lock
+    fcntl = None
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+
+
+class MetricsRegistry:
+    # Counters and histograms live in the process that records them. With a shared directory
+    # (METRICS_MULTIPROCESS_DIR, set by gunicorn.conf.py) every process also writes a snapshot there
+    # every few seconds and /metrics renders the sum over all of them: serving workers, the training
+    # runner and processes that have exited, so totals don't drop when a worker is recycled.
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS, multiprocess_dir: str = None) -> None:
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self.multiprocess_dir = multiprocess_dir or os.getenv("METRICS_MULTIPROCESS_DIR")
+        self.flush_interval = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+        self._flusher_pid = None
+        if self.multiprocess_dir:
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+            atexit.register(self.flush)
+
+    def _reset_after_fork(self) -> None:
+        # What the parent recorded is in the parent's snapshot; the child starts from zero
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def flush_periodically():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        threading.Thread(target=flush_periodically, name="metrics-flusher", daemon=True).start()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if self.multiprocess_dir and self._flusher_pid != os.getpid():
+            self._start_flusher()
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if self.multiprocess_dir and self._flusher_pid != os.getpid():
+            self._start_flusher()
+        key = self._key(name, labels)
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][bucket_index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: dict = None) -> str:
+        items = list(labels) + list((extra or {}).items())
+        if not items:
+            return ""
+        return "{" + ",".join(f'{key}="{str(value)}"' for key, value in items) + "}"
+
+    @staticmethod
+    def process_memory() -> dict:
+        memory = {}
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            memory["process_peak_resident_memory_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        try:
+            with open("/proc/self/statm") as statm:
+                memory["process_resident_memory_bytes"] = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            pass
+        return memory
+
+    def snapshot(self) -> tuple:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for key, h in self._histograms.items()}
+        return counters, histograms
+
+    @staticmethod
+    def _write_snapshot(file_path: str, counters: dict, histograms: dict) -> None:
+        content = {
+            "counters": [[name, [list(item) for item in labels], value] for (name, labels), value in counters.items()],
+            "histograms": [[name, [list(item) for item in labels], histogram] for (name, labels), histogram in histograms.items()],
+        }
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as snapshot_file:
+            json.dump(content, snapshot_file)
+        os.replace(temp_path, file_path)
+
+    @staticmethod
+    def _read_snapshot(file_path: str) -> tuple:
+        with open(file_path) as snapshot_file:
+            content = json.load(snapshot_file)
+        counters = {(name, tuple(tuple(item) for item in labels)): value for name, labels, value in content["counters"]}
+        histograms = {(name, tuple(tuple(item) for item in labels)): histogram for name, labels, histogram in content["histograms"]}
+        return counters, histograms
+
+    @staticmethod
+    def _merge(target: tuple, source: tuple) -> None:
+        counters, histograms = target
+        for key, value in source[0].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, histogram in source[1].items():
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = {"buckets": list(histogram["buckets"]), "sum": histogram["sum"], "count": histogram["count"]}
+            else:
+                merged["buckets"] = [a + b for a, b in zip(merged["buckets"], histogram["buckets"])]
+                merged["sum"] += histogram["sum"]
+                merged["count"] += histogram["count"]
+
+    def flush(self) -> None:
+        if not self.multiprocess_dir:
+            return
+        try:
+            counters, histograms = self.snapshot()
+            self._write_snapshot(os.path.join(self.multiprocess_dir, f"{os.getpid()}.json"), counters, histograms)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _is_running(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass
+        return True
+
+    def collect(self) -> tuple:
+        # This process's live values plus the latest snapshot of every other process. Snapshots of
+        # exited processes are folded into archived.json so the directory doesn't grow with recycling.
+        merged = self.snapshot()
+        if not self.multiprocess_dir:
+            return merged
+        archive_path = os.path.join(self.multiprocess_dir, "archived.json")
+        with open(os.path.join(self.multiprocess_dir, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            archived = self._read_snapshot(archive_path) if os.path.exists(archive_path) else ({}, {})
+            exited = []
+            for snapshot_path in glob.glob(os.path.join(self.multiprocess_dir, "[0-9]*.json")):
+                pid = int(os.path.basename(snapshot_path).split(".")[0])
+                if pid == os.getpid():
+                    continue
+                try:
+                    snapshot = self._read_snapshot(snapshot_path)
+                except (OSError, ValueError):
+                    continue
+                if self._is_running(pid):
+                    self._merge(merged, snapshot)
+                else:
+                    self._merge(archived, snapshot)
+                    exited.append(snapshot_path)
+            if exited:
+                self._write_snapshot(archive_path, *archived)
+                for snapshot_path in exited:
+                    os.remove(snapshot_path)
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._merge(merged, archived)
+        return merged
+
+    def render_prometheus(self) -> str:
+        lines = []
+        counters, histograms = self.collect()
+
+        for metric_name in sorted({name for name, _ in counters}):
+            if metric_name in self._help:
+                lines.append(f"# HELP {metric_name} {self._help[metric_name]}")
+            lines.append(f"# TYPE {metric_name} counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric_name:
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for metric_name in sorted({name for name, _ in histograms}):
+            if metric_name in self._help:
+                lines.append(f"# HELP {metric_name} {self._help[metric_name]}")
+            lines.append(f"# TYPE {metric_name} histogram")
+            for (name, labels), histogram in sorted(histograms.items()):
+                if name != metric_name:
+                    continue
+                cumulative = 0
+                for upper_bound, bucket_count in zip(self.buckets + ("+Inf",), histogram["buckets"]):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{self._format_labels(labels, {'le': upper_bound})} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {histogram['count']}")
+
+        # Memory gauges are those of the process answering the request
+        for name, value in self.process_memory().items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("wafer_pipeline_stage_duration_seconds", "Duration of training pipeline stages")
+metrics.describe("wafer_prediction_step_duration_seconds", "Duration of prediction pipeline sub-steps")
+metrics.describe("wafer_http_requests_total", "HTTP requests by endpoint and status code")
+metrics.describe("wafer_http_request_duration_seconds", "HTTP request latency by endpoint")
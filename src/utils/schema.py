@@ -0,0 +1,109 @@
+import os
+import sys
+from functools import lru_cache
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.main_utils import MainUtils
+
+
+class SchemaValidationError(ValueError):
+    # Input that does not match the schema; carries the per-row report so callers can return it to the client
+    def __init__(self, message: str, report: pd.DataFrame = None) -> None:
+        super().__init__(message)
+        self.report = report if report is not None else pd.DataFrame(columns=["row", "non_numeric", "out_of_range", "nan_ratio"])
+
+
+class WaferSchema:
+    def __init__(self, schema_config: dict) -> None:
+        columns_config = schema_config["columns"]
+        validation_config = schema_config.get("validation", {}) or {}
+        self.sensor_columns = [f"{columns_config['sensor_prefix']}{i+1}" for i in range(columns_config["num_sensors"])]
+        self.target_column = columns_config["target_column"]
+        self.target_values = columns_config.get("target_values", [1, -1])
+        self.column_index = {column: i for i, column in enumerate(self.sensor_columns)}
+        # FEATURE_DTYPE=float32 opts into the compact path without editing the schema file
+        self.dtype = np.dtype(os.getenv("FEATURE_DTYPE") or schema_config.get("dtype", "float64"))
+        self.min_value = validation_config.get("min_value", -np.inf)
+        self.max_value = validation_config.get("max_value", np.inf)
+        self.max_nan_ratio_per_row = validation_config.get("max_nan_ratio_per_row", 1.0)
+        self.max_reported_rows = validation_config.get("max_reported_rows", 10)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.sensor_columns)
+
+    def columns(self, include_target: bool = False) -> List[str]:
+        return self.sensor_columns + [self.target_column] if include_target else list(self.sensor_columns)
+
+    def dtype_map(self, dtype: str = None, include_target: bool = False) -> dict:
+        return {column: np.dtype(dtype or self.dtype) for column in self.columns(include_target)}
+
+    def align(self, df: pd.DataFrame, include_target: bool = False) -> pd.DataFrame:
+        # Reorders by column name and drops extras; only headerless legacy files fall back to position
+        expected_columns = self.columns(include_target)
+        missing_columns = [column for column in expected_columns if column not in df.columns]
+        if not missing_columns:
+            if df.columns.tolist() == expected_columns:
+                return df
+            return df[expected_columns]
+
+        legacy_header = all(str(column).isdigit() or str(column).startswith("Unnamed") for column in df.columns)
+        if legacy_header and df.shape[1] == len(expected_columns):
+            logging.warning("Input has no sensor header; assigning expected columns by position")
+            df = df.copy()
+            df.columns = expected_columns
+            return df
+
+        raise SchemaValidationError(
+            f"Input is missing {len(missing_columns)} of {len(expected_columns)} expected columns, e.g. {missing_columns[:5]}"
+        )
+
+    def to_array(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns the sensor matrix and a mask of cells that were present but not numeric
+        df = self.align(df)
+        non_numeric = np.zeros(df.shape, dtype=bool)
+        object_columns = [column for column in df.columns if df[column].dtype.kind not in "biuf"]
+        if object_columns:
+            df = df.copy()
+            for column in object_columns:
+                coerced = pd.to_numeric(df[column], errors="coerce")
+                non_numeric[:, self.column_index[column]] = coerced.isna().to_numpy() & df[column].notna().to_numpy()
+                df[column] = coerced
+        return df.to_numpy(dtype=self.dtype), non_numeric
+
+    def validate_array(self, features: np.ndarray, non_numeric: np.ndarray = None, row_offset: int = 0) -> pd.DataFrame:
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise CustomException(f"Expected an array of shape (n, {self.n_features}), got {features.shape}", sys)
+        nan_mask = np.isnan(features)
+        with np.errstate(invalid="ignore"):
+            out_of_range = (features < self.min_value) | (features > self.max_value)
+        n_non_numeric = non_numeric.sum(axis=1) if non_numeric is not None else np.zeros(len(features), dtype=int)
+        n_out_of_range = out_of_range.sum(axis=1)
+        nan_ratio = (nan_mask.sum(axis=1) - n_non_numeric) / self.n_features
+        invalid_rows = np.flatnonzero((n_non_numeric > 0) | (n_out_of_range > 0) | (nan_ratio > self.max_nan_ratio_per_row))
+
+        report = pd.DataFrame({
+            "row": invalid_rows + row_offset,
+            "non_numeric": n_non_numeric[invalid_rows],
+            "out_of_range": n_out_of_range[invalid_rows],
+            "nan_ratio": nan_ratio[invalid_rows]
+        })
+        return report
+
+    def validate(self, df: pd.DataFrame, row_offset: int = 0) -> Tuple[np.ndarray, pd.DataFrame]:
+        features, non_numeric = self.to_array(df)
+        return features, self.validate_array(features, non_numeric, row_offset=row_offset)
+
+    def raise_for_report(self, report: pd.DataFrame) -> None:
+        if report.empty:
+            return
+        failing_rows = report.head(self.max_reported_rows).to_dict(orient="records")
+        raise SchemaValidationError(f"{len(report)} rows failed schema validation, e.g. {failing_rows}", report)
+
+
+@lru_cache(maxsize=None)
+def load_schema() -> WaferSchema:
+    return WaferSchema(MainUtils().read_schema_config_file())
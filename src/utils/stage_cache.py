@@ -0,0 +1,101 @@
+import sys
+import os
+import shutil
+import hashlib
+from typing import Dict, List
+from dataclasses import dataclass
+from src.constant import *
+from src.exception import CustomException
+from src.logger import logging
+from src.utils.main_utils import MainUtils
+
+# Bump when a stage's code changes in a way that invalidates previously cached outputs
+STAGE_CACHE_VERSION = 2
+
+
+@dataclass
+class StageCacheConfig:
+    cache_dir: str = os.path.join(artifact_folder, "stage_cache")
+
+
+class StageCache:
+    def __init__(self, config: StageCacheConfig = None, force_rebuild: bool = False):
+        self.config = config or StageCacheConfig()
+        self.force_rebuild = force_rebuild
+        self.utils = MainUtils()
+
+    @staticmethod
+    def hash_file(sha, file_path: str) -> None:
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                sha.update(block)
+
+    def fingerprint(self, stage: str, input_paths: List[str] = (), values: List[object] = ()) -> str:
+        # Content hash of the input files and directories, plus config values, for one stage
+        try:
+            sha = hashlib.sha256(f"{stage}|{STAGE_CACHE_VERSION}".encode())
+            for input_path in input_paths:
+                if os.path.isdir(input_path):
+                    file_paths = sorted(
+                        os.path.join(root, file_name)
+                        for root, _, file_names in os.walk(input_path)
+                        for file_name in file_names
+                        if not file_name.endswith(".tmp")
+                    )
+                else:
+                    file_paths = [input_path]
+                for file_path in file_paths:
+                    sha.update(os.path.relpath(file_path, input_path).encode())
+                    self.hash_file(sha, file_path)
+            for value in values:
+                sha.update(repr(value).encode())
+            return sha.hexdigest()
+        except Exception as e:
+            logging.error(f"Error in StageCache.fingerprint: {str(e)}")
+            raise CustomException(e, sys)
+
+    def entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.config.cache_dir, stage, key)
+
+    def lookup(self, stage: str, key: str) -> dict:
+        if self.force_rebuild:
+            return None
+        manifest_path = os.path.join(self.entry_dir(stage, key), "manifest.yaml")
+        if not os.path.exists(manifest_path):
+            return None
+        logging.info(f"Stage cache hit for {stage} ({key[:12]})")
+        return self.utils.read_yaml_file(manifest_path)
+
+    def store(self, stage: str, key: str, output_paths: Dict[str, str], values: dict = None) -> None:
+        try:
+            entry_dir = self.entry_dir(stage, key)
+            os.makedirs(entry_dir, exist_ok=True)
+            for name, output_path in output_paths.items():
+                shutil.copyfile(output_path, os.path.join(entry_dir, name))
+            # The manifest is written last, so an entry only becomes visible once complete
+            self.utils.write_yaml_file(
+                os.path.join(entry_dir, "manifest.yaml"),
+                {"stage": stage, "key": key, "outputs": sorted(output_paths), "values": values or {}}
+            )
+            logging.info(f"Stored {stage} outputs in stage cache ({key[:12]})")
+        except Exception as e:
+            logging.error(f"Error in StageCache.store: {str(e)}")
+            raise CustomException(e, sys)
+
+    def invalidate(self, stage: str) -> None:
+        # Drops every cached entry of a stage, e.g. once its outputs were replaced outside the pipeline
+        shutil.rmtree(os.path.join(self.config.cache_dir, stage), ignore_errors=True)
+        logging.info(f"Invalidated {stage} entries in stage cache")
+
+    def restore(self, stage: str, key: str, output_paths: Dict[str, str]) -> None:
+        try:
+            entry_dir = self.entry_dir(stage, key)
+            for name, output_path in output_paths.items():
+                os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+                temp_path = f"{output_path}.{os.getpid()}.tmp"
+                shutil.copyfile(os.path.join(entry_dir, name), temp_path)
+                os.replace(temp_path, output_path)
+            logging.info(f"Restored {stage} outputs from stage cache ({key[:12]})")
+        except Exception as e:
+            logging.error(f"Error in StageCache.restore: {str(e)}")
+            raise CustomException(e, sys)
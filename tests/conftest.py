@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+from datetime import datetime
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Components resolve config/ and artifacts/ relative to the working directory
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), tmp_path / "config")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    # pymongo >= 4.11 passes sort= for every UpdateOne/ReplaceOne in bulk_write, which mongomock 4.3 does
+    # not accept. The loader never sets a sort, so dropping the argument keeps the behaviour identical.
+    from mongomock.collection import BulkOperationBuilder
+    for method_name in ("add_update", "add_replace"):
+        method = getattr(BulkOperationBuilder, method_name)
+        monkeypatch.setattr(BulkOperationBuilder, method_name, lambda self, *args, sort=None, _method=method, **kwargs: _method(self, *args, **kwargs))
+    return mongomock.MongoClient()
+
+
+@pytest.fixture
+def wafer_documents():
+    # Builds n documents shaped like the wafer loader writes them, with sensor values derived from the wafer number
+    from src.utils.schema import load_schema
+    schema = load_schema()
+
+    def build(n, start=0, offset=0.0):
+        updated_at = datetime.now()
+        documents = []
+        for i in range(start, start + n):
+            values = np.arange(schema.n_features, dtype=np.float64) + i + offset
+            document = dict(zip(schema.sensor_columns, values.tolist()))
+            document[schema.target_column] = 1 if i % 2 else -1
+            document["wafer_id"] = f"wafer-{i}"
+            document["updated_at"] = updated_at
+            documents.append(document)
+        return documents
+
+    return build
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.artifact_store import ArtifactStore
+
+
+@pytest.mark.parametrize("artifact_format", ["npy", "csv"])
+def test_chunks_hold_only_the_requested_columns(tmp_path, artifact_format):
+    df = pd.DataFrame(np.arange(30, dtype=np.float64).reshape(10, 3), columns=["a", "b", "c"])
+    store = ArtifactStore(artifact_format)
+    file_path = store.write_frame(df, str(tmp_path / "train"))
+
+    chunks = list(store.iter_file_chunks(file_path, 4, columns=["a", "c"]))
+    assert [start for start, _ in chunks] == [0, 4, 8]
+    projected = pd.concat([chunk for _, chunk in chunks], ignore_index=True)
+    pd.testing.assert_frame_equal(projected, df[["a", "c"]])
+
+    chunks = list(store.iter_file_chunks(file_path, 4))
+    pd.testing.assert_frame_equal(pd.concat([chunk for _, chunk in chunks], ignore_index=True), df)
@@ -0,0 +1,34 @@
+import os
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.pipeline.challengers import challenger_manager
+from src.pipeline.model_registry import model_registry
+from src.pipeline.training_jobs import TrainingInProgressError, training_job_manager
+from src.utils.inference_model import InferenceModel
+from src.utils.main_utils import MainUtils
+
+
+@pytest.fixture
+def challenger(workdir):
+    X = np.random.default_rng(0).normal(size=(40, 3))
+    y = (X[:, 0] > 0).astype(int)
+    preprocessor = Pipeline([("scaler", StandardScaler())]).fit(X)
+    model = LogisticRegression().fit(preprocessor.transform(X), y)
+    MainUtils.save_object(os.path.join(challenger_manager.config.challengers_dir, "candidate.pkl"),
+                          InferenceModel(preprocessor, model, ["a", "b", "c"]))
+    return "candidate"
+
+
+def test_promotion_is_refused_while_a_training_run_holds_the_lock(challenger):
+    with training_job_manager.training_lock():
+        with pytest.raises(TrainingInProgressError):
+            challenger_manager.promote(challenger)
+    assert not os.path.exists(model_registry.config.inference_model_path)
+
+    result = challenger_manager.promote(challenger)
+    assert result["retired"] is None
+    for path in (model_registry.config.inference_model_path, model_registry.config.model_file_path, model_registry.config.preprocessor_path):
+        assert os.path.exists(path)
@@ -0,0 +1,102 @@
+import os
+import pytest
+from src.constant import MONGO_COLLECTION_NAME, MONGO_DATABASE_NAME
+from src.components.data_ingestion import DataIngestion
+from src.utils.artifact_store import ArtifactStore
+
+
+def make_ingestion(mongo_client, batch_size=10):
+    ingestion = DataIngestion(mongo_client=mongo_client)
+    ingestion.data_ingestion_config.batch_size = batch_size
+    return ingestion
+
+
+def read_feature_store(feature_store_dir):
+    return ArtifactStore().read_partitions(feature_store_dir)
+
+
+def assert_consistent(ingestion, feature_store_dir):
+    state = ingestion.read_feature_store_state()
+    assert "pending_partitions" not in state
+    assert sorted(state["partitions"]) == [os.path.basename(path) for path in ArtifactStore.list_partitions(feature_store_dir)]
+    assert not ArtifactStore.list_partitions(feature_store_dir, prefix="_staging-")
+
+
+def test_ingestion_appends_only_new_documents(workdir, mongo_client, wafer_documents):
+    collection = mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME]
+    collection.insert_many(wafer_documents(25))
+    ingestion = make_ingestion(mongo_client)
+
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore.list_partitions(feature_store_dir)) == 3
+    assert len(read_feature_store(feature_store_dir)) == 25
+
+    ingestion.initiate_data_ingestion()
+    assert len(read_feature_store(feature_store_dir)) == 25
+
+    collection.insert_many(wafer_documents(5, start=25))
+    ingestion.initiate_data_ingestion()
+    assert len(read_feature_store(feature_store_dir)) == 30
+    assert_consistent(ingestion, feature_store_dir)
+
+
+def test_crash_before_publish_is_finished_by_next_run(workdir, mongo_client, wafer_documents, monkeypatch):
+    mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME].insert_many(wafer_documents(25))
+    ingestion = make_ingestion(mongo_client)
+    publish_partitions = ingestion.publish_partitions
+
+    def crash(staged_partitions):
+        raise RuntimeError("crashed before the rename")
+
+    monkeypatch.setattr(ingestion, "publish_partitions", crash)
+    with pytest.raises(Exception):
+        ingestion.initiate_data_ingestion()
+    assert ingestion.read_feature_store_state()["pending_partitions"]
+
+    monkeypatch.setattr(ingestion, "publish_partitions", publish_partitions)
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert len(read_feature_store(feature_store_dir)) == 25
+    assert_consistent(ingestion, feature_store_dir)
+
+
+def test_crash_after_publish_does_not_duplicate_delta(workdir, mongo_client, wafer_documents, monkeypatch):
+    mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME].insert_many(wafer_documents(25))
+    ingestion = make_ingestion(mongo_client)
+    write_yaml_file = ingestion.utils.write_yaml_file
+    calls = []
+
+    def crash_on_final_state(file_path, content):
+        calls.append(file_path)
+        if len(calls) == 2:
+            raise RuntimeError("crashed after the rename")
+        write_yaml_file(file_path, content)
+
+    monkeypatch.setattr(ingestion.utils, "write_yaml_file", crash_on_final_state)
+    with pytest.raises(Exception):
+        ingestion.initiate_data_ingestion()
+    monkeypatch.setattr(ingestion.utils, "write_yaml_file", write_yaml_file)
+
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert len(read_feature_store(feature_store_dir)) == 25
+    assert_consistent(ingestion, feature_store_dir)
+
+
+def test_crash_while_fetching_leaves_mark_unchanged(workdir, mongo_client, wafer_documents, monkeypatch):
+    mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME].insert_many(wafer_documents(25))
+    ingestion = make_ingestion(mongo_client)
+    export_collection_in_batches = ingestion.export_collection_in_batches
+
+    def crash_after_first_batch(*args, **kwargs):
+        batches = export_collection_in_batches(*args, **kwargs)
+        yield next(batches)
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(ingestion, "export_collection_in_batches", crash_after_first_batch)
+    with pytest.raises(Exception):
+        ingestion.initiate_data_ingestion()
+    assert ingestion.read_feature_store_state()["high_water_mark"] is None
+
+    monkeypatch.setattr(ingestion, "export_collection_in_batches", export_collection_in_batches)
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert len(read_feature_store(feature_store_dir)) == 25
+    assert_consistent(ingestion, feature_store_dir)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.feature_selector import FeatureSelector
+
+
+def sensor_frame(n_rows=200, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=n_rows)
+    other = rng.normal(size=n_rows)
+    mostly_missing = rng.normal(size=n_rows)
+    mostly_missing[: int(n_rows * 0.8)] = np.nan
+    return pd.DataFrame({
+        "keep_a": base,
+        "constant": np.full(n_rows, 3.0),
+        "duplicate_of_a": base * 2 + 1,
+        "keep_b": other,
+        "mostly_missing": mostly_missing,
+        "all_missing": np.full(n_rows, np.nan),
+        "anti_correlated_b": -other + rng.normal(scale=1e-3, size=n_rows),
+    })
+
+
+def test_drops_missing_constant_and_correlated_sensors():
+    X = sensor_frame()
+    selector = FeatureSelector().fit(X)
+    assert list(selector.get_feature_names_out()) == ["keep_a", "keep_b"]
+    assert list(selector.selected_indices_) == [0, 3]
+    assert list(selector.transform(X).columns) == ["keep_a", "keep_b"]
+    np.testing.assert_array_equal(selector.transform(X.to_numpy()), X[["keep_a", "keep_b"]].to_numpy())
+
+
+def test_the_earlier_of_two_correlated_sensors_is_kept():
+    X = sensor_frame()[["duplicate_of_a", "keep_a"]]
+    assert list(FeatureSelector().fit(X).get_feature_names_out()) == ["duplicate_of_a"]
+    assert list(FeatureSelector(max_correlation=None).fit(X).get_feature_names_out()) == ["duplicate_of_a", "keep_a"]
+
+
+def test_correlation_is_measured_on_mean_imputed_values():
+    # The copy is missing where the original is far from its mean; imputing the mean breaks the correlation
+    X = sensor_frame()[["keep_a"]].assign(partial_copy=lambda df: df["keep_a"].where(df["keep_a"].abs() < 1))
+    assert list(FeatureSelector().fit(X).get_feature_names_out()) == ["keep_a", "partial_copy"]
+
+
+def test_selecting_no_column_is_an_error():
+    with pytest.raises(ValueError):
+        FeatureSelector().fit(pd.DataFrame({"constant": np.ones(10)}))
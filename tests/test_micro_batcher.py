@@ -0,0 +1,50 @@
+import threading
+import numpy as np
+import pytest
+from src.pipeline.micro_batcher import MicroBatcher, MicroBatcherConfig
+
+
+def test_each_caller_gets_the_predictions_of_its_own_rows():
+    batch_sizes = []
+
+    def predict_fn(features):
+        batch_sizes.append(len(features))
+        return features[:, 0] * 10
+
+    batcher = MicroBatcher(predict_fn, MicroBatcherConfig(max_batch_size=1000, max_wait_ms=200))
+    requests = [np.arange(n * 2, dtype=np.float64).reshape(n, 2) + 100 * n for n in (1, 3, 2, 5)]
+    futures = [batcher.submit(features) for features in requests]
+
+    for features, future in zip(requests, futures):
+        np.testing.assert_array_equal(future.result(timeout=5), features[:, 0] * 10)
+    assert sum(batch_sizes) == 11
+    assert len(batch_sizes) < len(requests)
+
+
+def test_a_single_row_is_scored_as_one_row():
+    batcher = MicroBatcher(lambda features: features.sum(axis=1), MicroBatcherConfig(max_batch_size=8, max_wait_ms=1))
+    np.testing.assert_array_equal(batcher.predict(np.array([1.0, 2.0, 3.0]), timeout=5), [6.0])
+
+
+def test_a_failing_batch_fails_every_caller_in_it():
+    def predict_fn(features):
+        raise ValueError("model not loaded")
+
+    batcher = MicroBatcher(predict_fn, MicroBatcherConfig(max_batch_size=1000, max_wait_ms=50))
+    futures = [batcher.submit(np.zeros((2, 3))) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+
+def test_a_dead_worker_is_restarted_on_submit():
+    batcher = MicroBatcher(lambda features: features.sum(axis=1), MicroBatcherConfig(max_batch_size=8, max_wait_ms=1))
+    batcher.predict(np.ones((1, 2)), timeout=5)
+    first_worker = batcher._worker
+    # Stand-in for a worker that died, e.g. in a forked child where the parent's thread does not exist
+    batcher._worker = threading.Thread(target=lambda: None)
+    batcher._worker.start()
+    batcher._worker.join()
+
+    np.testing.assert_array_equal(batcher.predict(np.ones((1, 2)), timeout=5), [2.0])
+    assert batcher._worker.is_alive() and batcher._worker is not first_worker
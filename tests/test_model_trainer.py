@@ -0,0 +1,32 @@
+import shutil
+import numpy as np
+import pytest
+from sklearn.dummy import DummyClassifier
+from src.components.model_trainer import ModelTrainer, fit_and_score_fold
+
+
+class RecordingClassifier(DummyClassifier):
+    # Remembers which rows it was fitted on; column 0 of the test data holds the original row number
+    def fit(self, X, y, sample_weight=None):
+        self.fit_rows_ = np.asarray(X)[:, 0].astype(int)
+        return super().fit(X, y, sample_weight)
+
+
+@pytest.mark.parametrize("cv_folds", [5, 3, None])
+def test_every_fold_is_fitted_on_exactly_the_other_folds(cv_folds):
+    y = np.tile([0, 1], 50)[:97]
+    X = np.column_stack([np.arange(len(y)), np.zeros(len(y))]).astype(np.float64)
+    fold_ids, n_folds = ModelTrainer.assign_folds(y, {"cv_folds": cv_folds, "random_state": 0})
+    fold_data_dir, fold_bounds, order = ModelTrainer.write_fold_data(X, y, fold_ids, n_folds)
+    try:
+        assert fold_bounds[-1] == len(y)
+        for fold in range(n_folds):
+            result = fit_and_score_fold("dummy", RecordingClassifier(), 1, fold_data_dir, fold, fold_bounds)
+            fit_rows = result["model"].fit_rows_
+            assert len(fit_rows) == len(set(fit_rows))
+            assert set(fit_rows) == set(np.flatnonzero(fold_ids != fold))
+            # Out-of-fold scores come back in the order of this fold's rows in the grouped layout
+            assert len(result["oof_scores"]) == np.count_nonzero(fold_ids == fold)
+            assert set(order[fold_bounds[fold]:fold_bounds[fold + 1]]) == set(np.flatnonzero(fold_ids == fold))
+    finally:
+        shutil.rmtree(fold_data_dir, ignore_errors=True)
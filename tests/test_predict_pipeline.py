@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.constant import TARGET_COLUMN
+from src.pipeline.predict_pipeline import PredictionPipeline
+from src.pipeline.prediction_cache import prediction_cache
+from src.utils.inference_model import InferenceModel
+from src.utils.main_utils import MainUtils
+from src.utils.schema import load_schema
+
+
+@pytest.fixture
+def served_model(workdir, monkeypatch):
+    # A small fused model saved where the prediction pipeline looks for it
+    monkeypatch.setattr(prediction_cache.config, "enabled", False)
+    schema = load_schema()
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, schema.n_features))
+    y = np.where(X[:, 0] + X[:, 1] > 0, 1, 0)
+    preprocessor = Pipeline([("imputer", SimpleImputer()), ("scaler", StandardScaler())]).fit(X)
+    model = LogisticRegression().fit(preprocessor.transform(X), y)
+    pipeline = PredictionPipeline(None)
+    MainUtils.save_object(pipeline.predictions_pipeline_config.inference_model_path, InferenceModel(preprocessor, model, schema.sensor_columns))
+    return pipeline
+
+
+def write_upload(path, n_rows=50):
+    # Integer-valued sensors that only get a NaN in a late chunk, and a leftover index column
+    schema = load_schema()
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.integers(-3, 4, size=(n_rows, schema.n_features)), columns=schema.sensor_columns)
+    # Nullable ints are written without a decimal point, so only the chunk with the NaN parses as float
+    df[schema.sensor_columns[:5]] = df[schema.sensor_columns[:5]].astype("Int64")
+    df.loc[n_rows - 3, schema.sensor_columns[:5]] = pd.NA
+    df.to_csv(path)
+    return path
+
+
+def test_chunked_scoring_matches_whole_file_scoring(served_model, workdir):
+    upload_path = write_upload(workdir / "upload.csv")
+    whole = served_model.get_predicted_dataframe(str(upload_path), chunk_size=10000, output_file_path=str(workdir / "whole.csv"))
+    chunked = served_model.get_predicted_dataframe(str(upload_path), chunk_size=7, output_file_path=str(workdir / "chunked.csv"))
+
+    with open(whole, "rb") as whole_file, open(chunked, "rb") as chunked_file:
+        assert whole_file.read() == chunked_file.read()
+    output = pd.read_csv(chunked)
+    assert len(output) == 50
+    assert set(output[TARGET_COLUMN]) <= {"Good", "Bad"}
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from src.pipeline.prediction_cache import PredictionCache, PredictionCacheConfig
+
+
+def make_cache(disk_dir=None):
+    return PredictionCache(PredictionCacheConfig(enabled=True, max_memory_rows=100, disk_dir=disk_dir, max_disk_rows=1000))
+
+
+def test_row_keys_depend_on_values_and_dtype_only():
+    features = np.array([[1.0, np.nan], [1.0, 2.0], [1.0, np.nan]])
+    keys = PredictionCache.row_keys(features)
+    assert keys[0] == keys[2]
+    assert keys[0] != keys[1]
+    # Any NaN bit pattern hashes like the canonical NaN
+    other_nan = np.array([[1.0, -np.nan]])
+    assert PredictionCache.row_keys(other_nan)[0] == keys[0]
+    assert PredictionCache.row_keys(features.astype(np.float32))[1] != keys[1]
+
+
+@pytest.mark.parametrize("use_disk", [False, True])
+def test_new_model_version_invalidates_cached_rows(tmp_path, use_disk):
+    cache = make_cache(str(tmp_path) if use_disk else None)
+    keys = PredictionCache.row_keys(np.arange(6, dtype=np.float64).reshape(3, 2))
+
+    found, missing = cache.get_many("v1", keys)
+    assert found == {} and missing == [0, 1, 2]
+    cache.put_many("v1", keys[:2], np.array([1, 0]))
+
+    found, missing = cache.get_many("v1", keys)
+    assert found == {0: 1, 1: 0} and missing == [2]
+
+    found, missing = cache.get_many("v2", keys)
+    assert found == {} and missing == [0, 1, 2]
+    # A put for a version that is no longer current is dropped
+    cache.put_many("v1", keys, np.array([1, 1, 1]))
+    assert cache.get_many("v2", keys)[0] == {}
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    keys = PredictionCache.row_keys(np.ones((2, 3)))
+    writer = make_cache(str(tmp_path))
+    writer.get_many("v1", keys)
+    writer.put_many("v1", keys[:1], np.array([-1]))
+
+    reader = make_cache(str(tmp_path))
+    found, missing = reader.get_many("v1", keys)
+    assert found == {0: -1, 1: -1} and missing == []
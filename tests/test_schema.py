@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.schema import SchemaValidationError, WaferSchema
+
+
+@pytest.fixture
+def schema():
+    return WaferSchema({
+        "columns": {"sensor_prefix": "Sensor-", "num_sensors": 4, "target_column": "Good/Bad"},
+        "validation": {"min_value": -100, "max_value": 100, "max_nan_ratio_per_row": 0.5, "max_reported_rows": 2},
+    })
+
+
+def test_report_lists_only_failing_rows_with_their_problems(schema):
+    df = pd.DataFrame({
+        "Sensor-1": [1.0, 500.0, np.nan, 1.0, "abc"],
+        "Sensor-2": [1.0, 1.0, np.nan, 1.0, 1.0],
+        "Sensor-3": [1.0, -500.0, np.nan, np.nan, 1.0],
+        "Sensor-4": [1.0, 1.0, 1.0, 1.0, 1.0],
+    })
+    features, report = schema.validate(df, row_offset=10)
+    assert features.shape == (5, 4)
+    assert report.to_dict(orient="records") == [
+        {"row": 11, "non_numeric": 0, "out_of_range": 2, "nan_ratio": 0.0},
+        {"row": 12, "non_numeric": 0, "out_of_range": 0, "nan_ratio": 0.75},
+        {"row": 14, "non_numeric": 1, "out_of_range": 0, "nan_ratio": 0.0},
+    ]
+
+
+def test_columns_are_matched_by_name(schema):
+    df = pd.DataFrame([[4.0, 3.0, 2.0, 1.0, 9.0]], columns=["Sensor-4", "Sensor-3", "Sensor-2", "Sensor-1", "extra"])
+    features, report = schema.validate(df)
+    np.testing.assert_array_equal(features, [[1.0, 2.0, 3.0, 4.0]])
+    assert report.empty
+
+
+def test_missing_columns_are_rejected(schema):
+    with pytest.raises(SchemaValidationError):
+        schema.validate(pd.DataFrame({"Sensor-1": [1.0], "Sensor-2": [1.0]}))
+
+
+def test_raise_for_report_carries_the_full_report(schema):
+    report = schema.validate_array(np.full((3, 4), 1000.0))
+    with pytest.raises(SchemaValidationError) as excinfo:
+        schema.raise_for_report(report)
+    assert len(excinfo.value.report) == 3
+    assert "3 rows failed" in str(excinfo.value)
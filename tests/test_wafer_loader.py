@@ -0,0 +1,125 @@
+from datetime import datetime
+import pandas as pd
+from src.constant import MONGO_COLLECTION_NAME, MONGO_DATABASE_NAME
+from src.components.data_ingestion import DataIngestion
+from src.components.wafer_loader import WaferLoader, WaferLoaderConfig
+from src.utils.artifact_store import ArtifactStore
+
+
+def write_wafer_file(path, documents):
+    df = pd.DataFrame(documents).drop(columns=["updated_at"])
+    df.insert(0, "Wafer", df.pop("wafer_id"))
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def load(mongo_client, paths):
+    return WaferLoader(mongo_client, WaferLoaderConfig(batch_size=7, n_workers=2)).load(paths)
+
+
+def make_ingestion(mongo_client, batch_size=4):
+    ingestion = DataIngestion(mongo_client=mongo_client)
+    ingestion.data_ingestion_config.batch_size = batch_size
+    return ingestion
+
+
+def test_reloading_a_file_upserts_instead_of_duplicating(workdir, mongo_client, wafer_documents):
+    wafer_file = write_wafer_file(workdir / "wafers.csv", wafer_documents(20))
+    assert load(mongo_client, [wafer_file])["upserted"] == 20
+
+    stats = load(mongo_client, [wafer_file])
+    assert stats["upserted"] == 0 and stats["matched"] == 20
+    collection = mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME]
+    assert collection.count_documents({}) == 20
+    assert collection.find_one({"wafer_id": "wafer-3"})["Sensor-2"] == 4.0
+
+
+def test_updated_at_mark_does_not_skip_documents_sharing_a_timestamp(workdir, mongo_client, wafer_documents):
+    # Every document of a load shares one updated_at; ingestion runs after the first part of a file is written
+    collection = mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME]
+    updated_at = datetime(2026, 1, 1)
+    documents = [{**document, "updated_at": updated_at} for document in wafer_documents(10)]
+    collection.insert_many(documents[:6])
+    ingestion = make_ingestion(mongo_client)
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore().read_partitions(feature_store_dir)) == 6
+
+    collection.insert_many(documents[6:])
+    ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore().read_partitions(feature_store_dir)) == 10
+
+    load(mongo_client, [write_wafer_file(workdir / "more.csv", wafer_documents(10, start=10))])
+    ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore().read_partitions(feature_store_dir)) == 20
+
+
+def test_reingested_wafers_keep_only_their_latest_row(workdir, mongo_client, wafer_documents):
+    load(mongo_client, [write_wafer_file(workdir / "wafers.csv", wafer_documents(10))])
+    ingestion = make_ingestion(mongo_client)
+    feature_store_dir = ingestion.initiate_data_ingestion()
+
+    # Wafers 5-9 are measured again with new readings
+    load(mongo_client, [write_wafer_file(workdir / "remeasured.csv", wafer_documents(5, start=5, offset=1000.0))])
+    ingestion.initiate_data_ingestion()
+
+    feature_store = ArtifactStore().read_partitions(feature_store_dir)
+    assert len(feature_store) == 10
+    assert sorted(feature_store["Sensor-1"]) == [0.0, 1.0, 2.0, 3.0, 4.0, 1005.0, 1006.0, 1007.0, 1008.0, 1009.0]
+
+    chunks = list(ArtifactStore().iter_frames(feature_store_dir, chunk_size=3))
+    assert sum(len(chunk) for chunk in chunks) == 10
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), feature_store)
+
+
+def test_wafer_upserted_after_the_mark_is_ingested_again(workdir, mongo_client, wafer_documents):
+    load(mongo_client, [write_wafer_file(workdir / "wafers.csv", wafer_documents(10))])
+    ingestion = make_ingestion(mongo_client)
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert ingestion.read_feature_store_state()["high_water_mark_field"] == "updated_at"
+
+    # The upsert keeps the wafer's _id; only its updated_at moves past the recorded mark
+    load(mongo_client, [write_wafer_file(workdir / "wafer-3.csv", wafer_documents(1, start=3, offset=500.0))])
+    ingestion.initiate_data_ingestion()
+
+    feature_store = ArtifactStore().read_partitions(feature_store_dir)
+    assert len(feature_store) == 10
+    assert 503.0 in set(feature_store["Sensor-1"]) and 3.0 not in set(feature_store["Sensor-1"])
+
+
+def test_documents_without_the_mark_field_are_read_before_the_others(workdir, mongo_client, wafer_documents):
+    collection = mongo_client[MONGO_DATABASE_NAME][MONGO_COLLECTION_NAME]
+
+    def legacy_documents(n, start):
+        documents = wafer_documents(n, start=start)
+        for document in documents:
+            del document["updated_at"]
+        return documents
+
+    collection.insert_many(legacy_documents(5, start=100))
+    ingestion = make_ingestion(mongo_client)
+    feature_store_dir = ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore().read_partitions(feature_store_dir)) == 5
+
+    collection.insert_many(legacy_documents(2, start=105) + wafer_documents(3))
+    ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore().read_partitions(feature_store_dir)) == 10
+
+    # Once a document with the field has been read, later documents without it cannot be ordered and are skipped
+    collection.insert_many(legacy_documents(1, start=107))
+    ingestion.initiate_data_ingestion()
+    assert len(ArtifactStore().read_partitions(feature_store_dir)) == 10
+
+
+def test_switching_from_an_id_mark_re_reads_the_collection(workdir, mongo_client, wafer_documents, monkeypatch):
+    load(mongo_client, [write_wafer_file(workdir / "wafers.csv", wafer_documents(6))])
+    ingestion = make_ingestion(mongo_client)
+    monkeypatch.setattr(ingestion.data_ingestion_config, "high_water_mark_field", "_id")
+    feature_store_dir = ingestion.initiate_data_ingestion()
+
+    monkeypatch.setattr(ingestion.data_ingestion_config, "high_water_mark_field", "updated_at")
+    load(mongo_client, [write_wafer_file(workdir / "wafer-2.csv", wafer_documents(1, start=2, offset=500.0))])
+    ingestion.initiate_data_ingestion()
+
+    feature_store = ArtifactStore().read_partitions(feature_store_dir)
+    assert len(feature_store) == 6
+    assert 502.0 in set(feature_store["Sensor-1"])